@@ -19,6 +19,9 @@ load_dotenv(BASE_DIR / ".env")
 # --- Single source of truth for Base ---
 from app.services.db import Base
 import app.models.question  # noqa: F401  (register tables)
+import app.models.pooled_question  # noqa: F401
+import app.models.generation_job  # noqa: F401
+import app.models.question_stat  # noqa: F401
 
 # Build DB URL from env (handles '@' safely)
 DB_HOST = os.getenv("DB_HOST", "127.0.0.1")
@@ -0,0 +1,51 @@
+"""add generation_jobs table
+
+Revision ID: 70e4140ee38a
+Revises: f52212407c92
+Create Date: 2026-10-19 11:03:27.881940
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '70e4140ee38a'
+down_revision: Union[str, Sequence[str], None] = 'f52212407c92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # idempotent: create_all (app startup) may already have created the table
+    if sa.inspect(op.get_bind()).has_table('generation_jobs'):
+        return
+    op.create_table(
+        'generation_jobs',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('doc_id', sa.String(), nullable=False),
+        sa.Column('query', sa.String(length=256), nullable=True),
+        sa.Column('k', sa.Integer(), nullable=False),
+        sa.Column('n_target', sa.Integer(), nullable=False),
+        sa.Column('n_done', sa.Integer(), nullable=False),
+        sa.Column('n_failed', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=16), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('owner', sa.String(length=128), nullable=True),
+        sa.Column('heartbeat_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('active_seconds', sa.Float(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_generation_jobs_status', 'generation_jobs', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_generation_jobs_status', table_name='generation_jobs')
+    op.drop_table('generation_jobs')
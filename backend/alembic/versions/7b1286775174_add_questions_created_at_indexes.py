@@ -0,0 +1,31 @@
+"""add questions created_at indexes
+
+Revision ID: 7b1286775174
+Revises: 873f5148e139
+Create Date: 2026-10-19 14:22:05.604318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b1286775174'
+down_revision: Union[str, Sequence[str], None] = '873f5148e139'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # IF NOT EXISTS: create_all makes these with a questions table it creates itself
+    op.execute("CREATE INDEX IF NOT EXISTS ix_questions_created_at ON questions (created_at)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_questions_doc_created_at ON questions (source_doc_id, created_at)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_questions_doc_created_at', table_name='questions')
+    op.drop_index('ix_questions_created_at', table_name='questions')
@@ -0,0 +1,33 @@
+"""add group_id to generation_jobs
+
+Revision ID: 873f5148e139
+Revises: 70e4140ee38a
+Create Date: 2026-10-19 13:40:12.118270
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '873f5148e139'
+down_revision: Union[str, Sequence[str], None] = '70e4140ee38a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # create_all (app startup) may already have created generation_jobs with the column
+    columns = {c['name'] for c in sa.inspect(op.get_bind()).get_columns('generation_jobs')}
+    if 'group_id' not in columns:
+        op.add_column('generation_jobs', sa.Column('group_id', postgresql.UUID(as_uuid=True), nullable=True))
+    op.execute("CREATE INDEX IF NOT EXISTS ix_generation_jobs_group_id ON generation_jobs (group_id)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_generation_jobs_group_id', table_name='generation_jobs')
+    op.drop_column('generation_jobs', 'group_id')
@@ -0,0 +1,100 @@
+"""add question_stats (trigger-maintained counts)
+
+Revision ID: d04e871e6539
+Revises: db355c58a46c
+Create Date: 2026-10-19 16:31:52.907114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd04e871e6539'
+down_revision: Union[str, Sequence[str], None] = 'db355c58a46c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (dim, key) pairs a batch of rows contributes to: one per dimension value + the total
+_DIM_ROWS = """
+    SELECT 'doc' AS dim, coalesce(source_doc_id, '') AS key FROM {rows}
+    UNION ALL SELECT 'topic', coalesce(topic, '') FROM {rows}
+    UNION ALL SELECT 'difficulty', coalesce(difficulty, '') FROM {rows}
+    UNION ALL SELECT 'total', '' FROM {rows}
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # idempotent: create_all (app startup) may already have created the table
+    if not sa.inspect(op.get_bind()).has_table('question_stats'):
+        op.create_table(
+            'question_stats',
+            sa.Column('dim', sa.String(length=16), nullable=False),
+            sa.Column('key', sa.String(), nullable=False),
+            sa.Column('n', sa.BigInteger(), nullable=False),
+            sa.PrimaryKeyConstraint('dim', 'key'),
+        )
+    op.execute("CREATE INDEX IF NOT EXISTS ix_question_stats_dim_n ON question_stats (dim, n)")
+    # statement-level triggers over transition tables: a 1M-row COPY costs one
+    # GROUP BY, not 1M row updates. Counts that reach 0 stay (reads skip them).
+    op.execute(f"""
+    CREATE OR REPLACE FUNCTION question_stats_apply() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP IN ('DELETE', 'UPDATE') THEN
+            UPDATE question_stats s SET n = s.n - d.n
+            FROM (SELECT dim, key, count(*) AS n FROM ({_DIM_ROWS.format(rows='old_rows')}) r
+                  GROUP BY 1, 2) d
+            WHERE s.dim = d.dim AND s.key = d.key;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO question_stats (dim, key, n)
+            SELECT dim, key, count(*) FROM ({_DIM_ROWS.format(rows='new_rows')}) r
+            GROUP BY 1, 2
+            ORDER BY 1, 2  -- consistent lock order between concurrent bulk loads
+            ON CONFLICT (dim, key) DO UPDATE SET n = question_stats.n + EXCLUDED.n;
+        END IF;
+        -- change counter for list validators (stats_service.version)
+        INSERT INTO question_stats (dim, key, n) VALUES ('version', '', 1)
+        ON CONFLICT (dim, key) DO UPDATE SET n = question_stats.n + 1;
+        RETURN NULL;
+    END $$
+    """)
+    # install triggers + backfill in this transaction (questions is locked meanwhile)
+    op.execute("DROP TRIGGER IF EXISTS trg_question_stats_ins ON questions")
+    op.execute("DROP TRIGGER IF EXISTS trg_question_stats_del ON questions")
+    op.execute("DROP TRIGGER IF EXISTS trg_question_stats_upd ON questions")
+    op.execute("""
+        CREATE TRIGGER trg_question_stats_ins AFTER INSERT ON questions
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION question_stats_apply()
+    """)
+    op.execute("""
+        CREATE TRIGGER trg_question_stats_del AFTER DELETE ON questions
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION question_stats_apply()
+    """)
+    op.execute("""
+        CREATE TRIGGER trg_question_stats_upd AFTER UPDATE ON questions
+            REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION question_stats_apply()
+    """)
+    # keep the change counter across a re-run so old list ETags never match again
+    op.execute("DELETE FROM question_stats WHERE dim <> 'version'")
+    op.execute(f"""
+        INSERT INTO question_stats (dim, key, n)
+        SELECT dim, key, count(*) FROM ({_DIM_ROWS.format(rows='questions')}) r GROUP BY 1, 2
+        UNION ALL SELECT 'version', '', 1
+        ON CONFLICT (dim, key) DO UPDATE SET n = question_stats.n + 1
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS trg_question_stats_upd ON questions")
+    op.execute("DROP TRIGGER IF EXISTS trg_question_stats_del ON questions")
+    op.execute("DROP TRIGGER IF EXISTS trg_question_stats_ins ON questions")
+    op.execute("DROP FUNCTION IF EXISTS question_stats_apply()")
+    op.drop_table('question_stats')
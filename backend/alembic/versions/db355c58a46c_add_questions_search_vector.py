@@ -0,0 +1,39 @@
+"""add questions.search_vector (full-text search) + GIN index
+
+Revision ID: db355c58a46c
+Revises: 7b1286775174
+Create Date: 2026-10-19 15:07:41.250873
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'db355c58a46c'
+down_revision: Union[str, Sequence[str], None] = '7b1286775174'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # stored generated column: kept current by Postgres on every insert/update (PG 12+).
+    # IF NOT EXISTS: earlier builds created it at app startup.
+    op.execute("""
+        ALTER TABLE questions ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(stem, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(topic, '')), 'A') ||
+            setweight(json_to_tsvector('english', coalesce(options, '[]'::json), '["string"]'), 'B') ||
+            setweight(to_tsvector('english', coalesce(explanation, '')), 'C')
+        ) STORED
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_questions_search_vector ON questions USING gin (search_vector)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS ix_questions_search_vector")
+    op.execute("ALTER TABLE questions DROP COLUMN IF EXISTS search_vector")
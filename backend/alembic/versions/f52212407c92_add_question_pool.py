@@ -0,0 +1,48 @@
+"""add question_pool table
+
+Revision ID: f52212407c92
+Revises: 81d6158f037c
+Create Date: 2026-10-19 09:12:41.503118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'f52212407c92'
+down_revision: Union[str, Sequence[str], None] = '81d6158f037c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # idempotent: create_all (app startup) may already have created the table
+    if sa.inspect(op.get_bind()).has_table('question_pool'):
+        return
+    op.create_table(
+        'question_pool',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('source_doc_id', sa.String(), nullable=False),
+        sa.Column('query', sa.String(length=256), nullable=True),
+        sa.Column('stem_key', sa.String(), nullable=False),
+        sa.Column('stem', sa.String(), nullable=False),
+        sa.Column('options', sa.JSON(), nullable=False),
+        sa.Column('answer', sa.String(), nullable=False),
+        sa.Column('explanation', sa.Text(), nullable=True),
+        sa.Column('difficulty', sa.String(length=16), nullable=True),
+        sa.Column('topic', sa.String(length=128), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('source_doc_id', 'stem_key', name='uq_question_pool_doc_stem'),
+    )
+    op.create_index('ix_question_pool_doc_query', 'question_pool', ['source_doc_id', 'query'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_question_pool_doc_query', table_name='question_pool')
+    op.drop_table('question_pool')
@@ -0,0 +1,38 @@
+# app/api/routes_admin.py
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import HTMLResponse, PlainTextResponse
+
+from app.services import tracing
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not tracing.is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+def _get(trace_id: str) -> tracing.Trace:
+    t = tracing.get_trace(trace_id)
+    if not t:
+        raise HTTPException(status_code=404, detail="Trace not found (expired or never recorded)")
+    return t
+
+@router.get("/traces")
+def traces():
+    """Most recent profiled requests first."""
+    return {"items": tracing.list_traces()}
+
+@router.get("/traces/{trace_id}")
+def trace(trace_id: str):
+    return _get(trace_id).to_dict()
+
+@router.get("/traces/{trace_id}/profile")
+def trace_profile(trace_id: str, format: str = "html"):
+    t = _get(trace_id)
+    if t.profile_html is None:
+        raise HTTPException(status_code=404, detail="No profile recorded for this trace")
+    if format == "text":
+        return PlainTextResponse(t.profile_text)
+    headers = {"Content-Disposition": f'attachment; filename="profile_{trace_id}.html"'}
+    return HTMLResponse(t.profile_html, headers=headers)
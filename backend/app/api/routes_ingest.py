@@ -1,8 +1,21 @@
-from fastapi import APIRouter, UploadFile, File
+import uuid
+from typing import Optional
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
 from app.services.ingestion_service import ingest_pdf
+from app.services import pool_service
 
 router = APIRouter()
 
 @router.post("/")
-async def ingest(file: UploadFile = File(...)):
-    return await ingest_pdf(file)
\ No newline at end of file
+async def ingest(file: UploadFile = File(...), docId: Optional[str] = Form(None)):
+    # docId → re-ingest an existing document (replaces its chunks, invalidates caches)
+    if docId is not None:
+        try:
+            docId = str(uuid.UUID(docId))  # ids are generated uuid4s; also keeps cache keys canonical
+        except ValueError:
+            raise HTTPException(status_code=422, detail="docId must be a document id (UUID)")
+    out = await ingest_pdf(file, doc_id=docId)
+    if out.get("docId"):
+        # background pre-generation (no-op unless POOL_ENABLED)
+        pool_service.schedule_refill(out["docId"], force=True)
+    return out
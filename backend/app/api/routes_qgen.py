@@ -1,33 +1,136 @@
+import asyncio
 from pydantic import BaseModel, Field
 from fastapi import APIRouter, HTTPException
 from typing import Optional, List
 from app.services import qgen_service
 from app.services.db import get_session
 from app.models.question import Question
+from app.services import job_service, metrics, pool_service, tracing
 
 router = APIRouter()
 
+# with a difficulty, generation stops once n items are at that level or after
+# DIFFICULTY_OVERSAMPLE × the shortfall items were generated (the rest are pooled)
+DIFFICULTY_OVERSAMPLE = 4
+
 class BatchReq(BaseModel):
     docId: str = Field(..., alias="docId")
     n: int = 5
     k: int = 8
     query: Optional[str] = None  # when present → semantic focus
+    difficulty: Optional[str] = None  # with the pool: generated items of other levels are pooled, not returned
 
 class FromDocQueryReq(BaseModel):
     docId: str = Field(..., alias="docId")
     query: str
     k: int = 8
 
+class JobReq(BaseModel):
+    docId: str = Field(..., alias="docId")
+    n: int = Field(..., ge=1, le=100_000)
+    k: int = 8
+    query: Optional[str] = None
+
+class CorpusJobReq(BaseModel):
+    docIds: Optional[List[str]] = None   # explicit documents …
+    topic: Optional[str] = None          # … and/or a topic (retrieval focus; discovers docs when no docIds)
+    perDoc: Optional[int] = Field(None, ge=1, le=100_000)
+    total: Optional[int] = Field(None, ge=1, le=1_000_000)  # split across docs (by relevance for topic discovery)
+    k: int = 8
+    maxDocs: int = Field(50, ge=1, le=1000)
+
+@router.post("/jobs", status_code=202)
+async def create_job(body: JobReq):
+    """Large batch generation: questions are saved as they are produced; poll GET /qgen/jobs/{id}."""
+    return await job_service.create_job(body.docId, body.n, query=body.query, k=body.k)
+
+@router.get("/jobs")
+def list_jobs(limit: int = 20, status: Optional[str] = None):
+    return {"items": job_service.list_jobs(limit=limit, status=status)}
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    return job_service.get_job(job_id)
+
+@router.post("/jobs/{job_id}/cancel")
+def cancel_job(job_id: str):
+    return job_service.cancel_job(job_id)
+
+@router.post("/corpus/jobs", status_code=202)
+async def create_corpus_job(body: CorpusJobReq):
+    """One managed run over many documents (one job per doc, run in parallel); poll GET /qgen/corpus/jobs/{id}."""
+    specs = await asyncio.to_thread(
+        job_service.plan_corpus, body.docIds, body.topic,
+        per_doc=body.perDoc, total=body.total, max_docs=body.maxDocs,
+    )
+    if not specs:
+        raise HTTPException(status_code=422, detail="Nothing to generate")
+    return await job_service.create_group(specs, k=body.k)
+
+@router.get("/corpus/jobs/{group_id}")
+def get_corpus_job(group_id: str):
+    return job_service.get_group(group_id)
+
+@router.post("/corpus/jobs/{group_id}/cancel")
+def cancel_corpus_job(group_id: str):
+    return job_service.cancel_group(group_id)
+
 @router.get("/preview_context_query")
 def preview_context_query(docId: str, query: str, k: int = 8):
     return qgen_service.preview_context_query(doc_id=docId, query=query, k=k)
 
+@router.post("/from_doc_query")
+async def from_doc_query(body: FromDocQueryReq):
+    """
+    One question focused on `query`, not saved. Greedy, so identical requests
+    in flight or within COALESCE_TTL_S share one retrieval + generation.
+    """
+    item = await qgen_service.generate_from_doc_query(doc_id=body.docId, query=body.query, k=body.k)
+    if "error" in item:
+        raise HTTPException(status_code=422, detail=item["error"])
+    return item
+
 @router.post("/from_doc_batch_and_save")
 async def from_doc_batch_and_save(body: BatchReq):
-    items = await qgen_service.generate_batch_from_doc(
-        doc_id=body.docId, n=body.n, query=body.query, k=body.k
-    )
-    if not items:
+    # 1) see what the pre-generated pool can serve (already validated; claimed at save time)
+    pool_stems = set()
+    if pool_service.enabled():
+        pool_stems = await asyncio.to_thread(
+            pool_service.peek, body.docId, body.n, query=body.query, difficulty=body.difficulty
+        )
+
+    # 2) generate only the shortfall
+    items = []
+    off_level = deposited = 0
+    shortfall = body.n - len(pool_stems)
+    by_level = bool(body.difficulty) and pool_service.enabled()
+    budget = shortfall * DIFFICULTY_OVERSAMPLE if by_level else shortfall
+    seen = set(pool_stems)
+    while len(items) < shortfall and budget > 0:
+        want = min(shortfall - len(items), budget)
+        budget -= want
+        try:
+            batch = await qgen_service.generate_batch_from_doc(
+                doc_id=body.docId, n=want, query=body.query, k=body.k, seen=seen
+            )
+        except HTTPException:
+            if items or off_level:
+                break  # keep what earlier rounds produced
+            raise
+        if not by_level:
+            items = batch
+            break
+        other = [d for d in batch if isinstance(d, dict) and d.get("difficulty") != body.difficulty]
+        if other:
+            off_level += len(other)
+            deposited += await asyncio.to_thread(pool_service.deposit, body.docId, body.query, other)
+        items += [d for d in batch if not (isinstance(d, dict) and d.get("difficulty") != body.difficulty)]
+        if not batch:
+            break
+
+    pool_service.schedule_refill(body.docId, body.query, k=body.k)
+
+    if not items and not pool_stems and not off_level:
         raise HTTPException(status_code=404, detail="No questions generated.")
 
     valid = []
@@ -52,31 +155,41 @@ async def from_doc_batch_and_save(body: BatchReq):
             continue
         valid.append(d)
 
-    if not valid:
+    if not valid and not pool_stems and not off_level:
         # nothing to save—surface why
         raise HTTPException(status_code=422, detail={"message": "All items failed quality checks", "rejected": rejected})
 
-    saved: List[Question] = []
-    try:
-        with get_session() as s:
-            for d in valid:
-                q = Question(
-                    stem=d["stem"],
-                    options=d["options"],
-                    answer=d["answer"],
-                    explanation=d["explanation"],
-                    difficulty=d["difficulty"],
-                    topic=d["topic"],
-                    source_doc_id=d.get("source_doc_id") or body.docId,
-                )
-                s.add(q)
-                saved.append(q)
+    # 3) claim the pooled rows and save the generated ones in one transaction
+    def _save():
+        saved = [
+            Question(
+                stem=d["stem"],
+                options=d["options"],
+                answer=d["answer"],
+                explanation=d["explanation"],
+                difficulty=d["difficulty"],
+                topic=d["topic"],
+                source_doc_id=d.get("source_doc_id") or body.docId,
+            )
+            for d in valid
+        ]
+        with tracing.span("db.save_batch", rows=len(valid), pooled=len(pool_stems)), \
+                metrics.DB_WRITE_SECONDS.labels(op="save_batch").time(), get_session() as s:
+            pooled = pool_service.serve_into(
+                s, body.docId, len(pool_stems), query=body.query, difficulty=body.difficulty
+            ) if pool_stems else []
+            s.add_all(saved)
             s.commit()
-            for q in saved:
+            for q in pooled + saved:
                 s.refresh(q)
+        return pooled, saved
+
+    try:
+        pooled, saved = await asyncio.to_thread(_save)
     except Exception as e:
-        # rollback is automatic on context exit if commit didn't happen, but be explicit just in case
+        # rollback is automatic on context exit if commit didn't happen
         raise HTTPException(status_code=500, detail=f"DB error while saving batch: {e}")
+    metrics.POOL_SERVED.inc(len(pooled))
 
     return {
         "saved": [
@@ -91,7 +204,9 @@ async def from_doc_batch_and_save(body: BatchReq):
                 "source_doc_id": q.source_doc_id,
                 "created_at": q.created_at,
             }
-            for q in saved
+            for q in pooled + saved
         ],
+        "from_pool": len(pooled),
+        "pooled": deposited,  # generated at another difficulty; served by later requests
         "rejected": rejected,  # each has {"item": <raw>, "reason": "..."}
     }
\ No newline at end of file
@@ -1,73 +1,127 @@
 # app/api/routes_questions.py
-from fastapi import APIRouter, HTTPException
-from typing import Optional, List, Dict, Any
-from sqlalchemy import select, desc
+from fastapi import APIRouter, File, HTTPException, Query, Request, Response, UploadFile
+from typing import Any, Callable, Dict, Optional
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from sqlalchemy import String, cast, select, desc, func, literal, literal_column, or_, text
 from app.services.db import get_session
 from app.models.question import Question
-from fastapi.responses import StreamingResponse, JSONResponse
-import io, csv
+from app.services import import_service, stats_service
+from fastapi.responses import StreamingResponse, JSONResponse, ORJSONResponse
+import hashlib, io, csv, json, time, uuid
 
 router = APIRouter()
 
-def _row_to_dict(q: Question) -> Dict[str, Any]:
-    return {
-        "id": str(q.id),
-        "stem": q.stem,
-        "options": q.options,
-        "answer": q.answer,
-        "source_doc_id": q.source_doc_id,
-        "explanation": q.explanation,
-        "difficulty": q.difficulty,
-        "topic": q.topic,
-        "created_at": q.created_at,
-    }
+# Read path: plain column tuples (no ORM identity map / instance state), serialized
+# by orjson, which handles UUID and datetime natively.
+_COLUMNS = (
+    Question.id, Question.stem, Question.options, Question.answer, Question.source_doc_id,
+    Question.explanation, Question.difficulty, Question.topic, Question.created_at,
+)
 
+def _conds(doc_id: Optional[str] = None, topic: Optional[str] = None,
+           difficulty: Optional[str] = None) -> list:
+    conds = []
+    if doc_id:
+        conds.append(Question.source_doc_id == doc_id)
+    if topic:
+        conds.append(Question.topic == topic)
+    if difficulty:
+        conds.append(Question.difficulty == difficulty)
+    return conds
+
+# ---- conditional GETs -------------------------------------------------------------
+# Questions are immutable once saved, so a listing only changes when a row is added
+# or removed. Where the question_stats triggers are installed, the list validator is
+# their change counter (one primary-key read, see stats_service.version); elsewhere
+# it is (matching count, newest created_at), computed live. Imports keep their
+# exported created_at, which may be older than what a client already saw, so lists
+# get no Last-Modified / If-Modified-Since, only the ETag. A matching If-None-Match
+# is answered with 304 before any row is fetched or serialized.
+
+def _aware(ts: Optional[datetime]) -> Optional[datetime]:
+    # SQLite hands back naive datetimes
+    return ts.replace(tzinfo=timezone.utc) if ts is not None and ts.tzinfo is None else ts
+
+def _etag(*parts: Any) -> str:
+    return '"' + hashlib.sha1("|".join(map(str, parts)).encode()).hexdigest()[:20] + '"'
+
+def _not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    inm = request.headers.get("if-none-match")
+    if inm is not None:  # takes precedence over If-Modified-Since (RFC 9110 §13.2.2)
+        tags = [t.strip().removeprefix("W/") for t in inm.split(",")]
+        return "*" in tags or etag in tags
+    ims = request.headers.get("if-modified-since")
+    if ims and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(ims)
+        except (TypeError, ValueError):
+            return False
+        # HTTP dates have 1s resolution: only 304 when the newest row is not newer than that
+        return _aware(last_modified) <= since
+    return False
+
+def _conditional(request: Request, etag: str, last_modified: Optional[datetime],
+                 build: Callable[[], Any], cache_control: str = "no-cache") -> Response:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(_aware(last_modified).astimezone(timezone.utc), usegmt=True)
+    if _not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    return ORJSONResponse(build(), headers=headers)
+
+def _list(request: Request, scope: str, limit: int, doc_id: Optional[str] = None,
+          topic: Optional[str] = None, difficulty: Optional[str] = None,
+          columns: tuple = _COLUMNS, envelope: bool = False) -> Response:
+    conds = _conds(doc_id=doc_id, topic=topic, difficulty=difficulty)
+    with get_session() as s:
+        version = stats_service.version(session=s)
+        if version is not None:
+            etag = _etag(scope, limit, "v", version)
+        else:
+            n = s.execute(select(func.count(Question.id)).where(*conds)).scalar_one()
+            newest = s.execute(select(func.max(Question.created_at)).where(*conds)).scalar()
+            etag = _etag(scope, limit, n, newest.isoformat() if newest else "empty")
+
+        def build():
+            stmt = select(*columns).where(*conds).order_by(desc(Question.created_at)).limit(limit)
+            rows = [dict(r) for r in s.execute(stmt).mappings()]
+            return {"items": rows} if envelope else rows
+
+        return _conditional(request, etag, None, build)
+
+
+_LATEST_COLUMNS = (Question.id, Question.stem, Question.answer, Question.created_at)
 
 @router.get("/latest")
-def latest(limit: int = 10,
+def latest(request: Request,
+           limit: int = 5,
            topic: Optional[str] = None,
-           difficulty: Optional[str] = None) -> List[Dict[str, Any]]:
-    with get_session() as s:
-        stmt = select(Question).order_by(desc(Question.created_at)).limit(limit)
-        if topic:
-            stmt = stmt.filter(Question.topic == topic)
-        if difficulty:
-            stmt = stmt.filter(Question.difficulty == difficulty)
-        rows = s.execute(stmt).scalars().all()
-        return [_row_to_dict(q) for q in rows]
+           difficulty: Optional[str] = None):
+    # {"items": [{id, stem, answer, created_at}, ...]}, newest first: the shape
+    # main.py's /questions/latest always served
+    return _list(request, f"latest|{topic}|{difficulty}", limit, topic=topic, difficulty=difficulty,
+                 columns=_LATEST_COLUMNS, envelope=True)
     
 @router.get("/by_doc/{doc_id}")
 def by_doc(doc_id: str,
+           request: Request,
            limit: int = 20,
            topic: Optional[str] = None,
-           difficulty: Optional[str] = None) -> List[Dict[str, Any]]:
-    with get_session() as s:
-        stmt = (
-            select(Question)
-            .where(Question.source_doc_id == doc_id)
-            .order_by(desc(Question.created_at))
-            .limit(limit)
-        )
-        if topic:
-            stmt = stmt.filter(Question.topic == topic)
-        if difficulty:
-            stmt = stmt.filter(Question.difficulty == difficulty)
-        rows = s.execute(stmt).scalars().all()
-        return [_row_to_dict(q) for q in rows]
-    
-@router.get("/{qid}")
-def get_one(qid: str) -> Dict[str, Any]:
-    with get_session() as s:
-        row = s.get(Question, qid)
-        if not row:
-            raise HTTPException(status_code=404, detail="Question not found")
-        return _row_to_dict(row)
+           difficulty: Optional[str] = None):
+    return _list(request, f"by_doc|{doc_id}|{topic}|{difficulty}", limit,
+                 doc_id=doc_id, topic=topic, difficulty=difficulty)
     
 @router.get("/count")
-def count():
-    with get_session() as s:
-        n = s.execute(select(func.count(Question.id))).scalar_one()
-        return {"count": n}
+def count(docId: Optional[str] = None):
+    return {"count": stats_service.total(docId)}
+
+@router.get("/stats")
+def stats(docId: Optional[str] = None,
+          topic: Optional[str] = None,
+          difficulty: Optional[str] = None):
+    """Counts per document / topic / difficulty from the trigger-maintained summary table."""
+    return ORJSONResponse(stats_service.summary(doc_id=docId, topic=topic, difficulty=difficulty))
     
 @router.get("/by_doc")
 def by_doc(docId: str, limit: int = 50):
@@ -98,7 +152,7 @@ def export_questions(
     topic: Optional[str] = None,
     difficulty: Optional[str] = None,
 ):
-    """Export questions as CSV (default) or JSON with optional filters."""
+    """Export questions as CSV (default), JSON or NDJSON with optional filters."""
     with get_session() as s:
         stmt = select(Question).order_by(desc(Question.created_at)).limit(limit)
         if docId:
@@ -109,23 +163,27 @@ def export_questions(
             stmt = stmt.filter(Question.difficulty == difficulty)
         rows = s.execute(stmt).scalars().all()
 
+        def as_dict(q: Question) -> Dict[str, Any]:
+            return {
+                "id": str(q.id),
+                "stem": q.stem,
+                "options": q.options,
+                "answer": q.answer,
+                "explanation": q.explanation,
+                "difficulty": q.difficulty,
+                "topic": q.topic,
+                "source_doc_id": q.source_doc_id,
+                "created_at": q.created_at.isoformat() if q.created_at else None,
+            }
+
         # JSON export
         if format.lower() == "json":
-            payload = [
-                {
-                    "id": str(q.id),
-                    "stem": q.stem,
-                    "options": q.options,
-                    "answer": q.answer,
-                    "explanation": q.explanation,
-                    "difficulty": q.difficulty,
-                    "topic": q.topic,
-                    "source_doc_id": q.source_doc_id,
-                    "created_at": q.created_at.isoformat() if q.created_at else None,
-                }
-                for q in rows
-            ]
-            return JSONResponse(payload)
+            return JSONResponse([as_dict(q) for q in rows])
+
+        # NDJSON export (one object per line; what /questions/import streams best)
+        if format.lower() == "ndjson":
+            lines = [json.dumps(as_dict(q), ensure_ascii=False) + "\n" for q in rows]
+            return StreamingResponse(iter(lines), media_type="application/x-ndjson")
 
         # CSV export (default)
         output = io.StringIO()
@@ -155,4 +213,99 @@ def export_questions(
         filename = "questions.csv" if not (docId or topic or difficulty) else \
             f"questions_{docId or topic or difficulty}.csv"
         headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
-        return StreamingResponse(iter([output.read()]), media_type="text/csv", headers=headers)
\ No newline at end of file
+        return StreamingResponse(iter([output.read()]), media_type="text/csv", headers=headers)
+
+@router.post("/import")
+def import_questions(file: UploadFile = File(...),
+                     format: Optional[str] = Query(None, pattern="^(csv|json|ndjson)$"),
+                     docId: Optional[str] = None):
+    """
+    Bulk load a bank in any /export shape (format from the extension or content
+    if omitted). Rows failing the generation quality gate are reported, not fatal;
+    ids already present are skipped. docId fills in rows without source_doc_id.
+    """
+    try:
+        return import_service.import_questions(file.file, format, filename=file.filename,
+                                               default_doc_id=docId)
+    except ValueError as e:  # undecodable upload / not a JSON array
+        raise HTTPException(status_code=422, detail=str(e))
+
+# ---- full-text search ---------------------------------------------------------------
+# questions.search_vector is a generated tsvector with a GIN index (migration
+# db355c58a46c); websearch_to_tsquery accepts "quoted phrases", OR and -negation.
+_TSV = literal_column("questions.search_vector")
+_TS_CONFIG = literal_column("'english'::regconfig")
+_FTS_RECHECK_S = 60.0
+_fts_checked_at: Optional[float] = None  # when the column was last seen missing
+_fts = False
+
+def _has_search_vector(s) -> bool:
+    """True once migration db355c58a46c has run (checked at most every _FTS_RECHECK_S while it hasn't)."""
+    global _fts, _fts_checked_at
+    if _fts or s.get_bind().dialect.name != "postgresql":
+        return _fts
+    now = time.monotonic()
+    if _fts_checked_at is None or now - _fts_checked_at >= _FTS_RECHECK_S:
+        _fts_checked_at = now
+        _fts = bool(s.execute(text(
+            "SELECT 1 FROM information_schema.columns "
+            "WHERE table_name = 'questions' AND column_name = 'search_vector'"
+        )).first())
+    return _fts
+
+def _like_escape(word: str) -> str:
+    return word.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def _search_stmt(fts: bool, q: str, conds: list):
+    if fts:
+        tsq = func.websearch_to_tsquery(_TS_CONFIG, q)
+        rank = func.ts_rank_cd(_TSV, tsq).label("rank")
+        stmt = select(*_COLUMNS, rank).where(_TSV.op("@@")(tsq), *conds)
+        return stmt.order_by(desc(rank), desc(Question.created_at))
+    # no search_vector (SQLite bench/dev, unmigrated Postgres): every word must
+    # appear literally in one of the searched fields, no ranking
+    fields = (Question.stem, Question.topic, Question.explanation, cast(Question.options, String))
+    for word in q.split():
+        pat = f"%{_like_escape(word)}%"
+        conds.append(or_(*(f.ilike(pat, escape="\\") for f in fields)))
+    return select(*_COLUMNS, literal(0.0).label("rank")).where(*conds).order_by(desc(Question.created_at))
+
+@router.get("/search")
+def search(q: str = Query(..., min_length=1, max_length=256),
+           limit: int = Query(20, ge=1, le=200),
+           offset: int = Query(0, ge=0, le=10_000),
+           docId: Optional[str] = None,
+           topic: Optional[str] = None,
+           difficulty: Optional[str] = None):
+    """Ranked full-text search over stem, options, explanation and topic; filters combine with AND."""
+    with get_session() as s:
+        stmt = _search_stmt(_has_search_vector(s), q,
+                            _conds(doc_id=docId, topic=topic, difficulty=difficulty))
+        rows = [dict(r) for r in s.execute(stmt.limit(limit + 1).offset(offset)).mappings()]
+    has_more = len(rows) > limit
+    return ORJSONResponse({
+        "items": rows[:limit],
+        "limit": limit,
+        "offset": offset,
+        "next_offset": offset + limit if has_more else None,
+    })
+
+# declared last: "/{qid}" would otherwise swallow /count, /by_doc and /export
+@router.get("/{qid}")
+def get_one(qid: str, request: Request):
+    try:
+        key = uuid.UUID(qid)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Question not found")
+    # a question never changes after it is saved: the id alone is a strong validator
+    etag = _etag("q", key)
+    cache_control = "private, max-age=86400, immutable"
+    # only a tag we handed out skips the lookup; "*" means "if it exists", so it needs the row
+    tags = [t.strip().removeprefix("W/") for t in request.headers.get("if-none-match", "").split(",")]
+    if etag in tags:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+    with get_session() as s:
+        row = s.execute(select(*_COLUMNS).where(Question.id == key)).mappings().first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Question not found")
+    return _conditional(request, etag, row["created_at"], lambda: dict(row), cache_control)
@@ -14,6 +14,53 @@ class Settings:
     DB_USER = os.getenv("DB_USER", "biomentor")
     DB_PASSWORD = os.getenv("DB_PASSWORD", "biomentor_pwd")
     ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
+    # Full SQLAlchemy URL; overrides the DB_* parts above (e.g. sqlite:///bench.db for the benchmarks)
+    DATABASE_URL = os.getenv("DATABASE_URL", "")
+
+    QDRANT_HOST = os.getenv("QDRANT_HOST", "127.0.0.1")
+    QDRANT_PORT = int(os.getenv("QDRANT_PORT", "6333"))
+    QDRANT_LOCATION = os.getenv("QDRANT_LOCATION", "")  # ":memory:" or a path → in-process Qdrant
+
+    LLM_MODEL_ID = os.getenv("LLM_MODEL_ID", "Qwen/Qwen2.5-1.5B-Instruct")
+
+    # Inference-server mode: comma-separated worker base URLs (app/inference_worker.py).
+    # Empty → models run inside each API process.
+    INFERENCE_URLS = os.getenv("INFERENCE_URLS", "")
+    INFERENCE_TIMEOUT_S = float(os.getenv("INFERENCE_TIMEOUT_S", "300"))
+    INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", "0"))  # torch threads per worker; 0 → torch default
+
+    # Single-flight + short-TTL result cache for deterministic retrieval/generation (0 → no cache)
+    COALESCE_TTL_S = float(os.getenv("COALESCE_TTL_S", "30"))
+    COALESCE_MAX_ENTRIES = int(os.getenv("COALESCE_MAX_ENTRIES", "1024"))
+
+    # Parallel PDF page extraction at ingest (0 → one worker per CPU; 1 → in-process, serial)
+    INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "0"))
+    INGEST_PAGES_PER_SHARD = int(os.getenv("INGEST_PAGES_PER_SHARD", "16"))
+
+    # Pre-generated question pool per document (see app/services/pool_service.py)
+    POOL_ENABLED = os.getenv("POOL_ENABLED", "false").lower() in ("1", "true", "yes")
+    POOL_HIGH_WATER = int(os.getenv("POOL_HIGH_WATER", "30"))
+    POOL_LOW_WATER = int(os.getenv("POOL_LOW_WATER", "10"))
+    POOL_REFILL_CHUNK = int(os.getenv("POOL_REFILL_CHUNK", "5"))  # questions generated + committed per step
+
+    # Resumable batch generation jobs (see app/services/job_service.py)
+    # jobs running per API process; default one per inference server (in-process generation is serialised anyway)
+    JOB_MAX_CONCURRENT = int(os.getenv("JOB_MAX_CONCURRENT", str(len([u for u in INFERENCE_URLS.split(",") if u.strip()]) or 1)))
+    JOB_LEASE_S = int(os.getenv("JOB_LEASE_S", "900"))               # no heartbeat for this long → job is resumed elsewhere
+    JOB_SWEEP_S = int(os.getenv("JOB_SWEEP_S", "30"))
+    JOB_MAX_CONSECUTIVE_FAILURES = int(os.getenv("JOB_MAX_CONSECUTIVE_FAILURES", "20"))
+
+    # Admin-only endpoints / per-request profiling (X-Profile: 1 + X-Admin-Token). Empty → disabled.
+    ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+    TRACE_STORE_MAX = int(os.getenv("TRACE_STORE_MAX", "50"))
+
+    # In-process per-document vector cache (see app/services/vector_cache.py)
+    VECTOR_CACHE_ENABLED = os.getenv("VECTOR_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+    VECTOR_CACHE_MAX_MB = float(os.getenv("VECTOR_CACHE_MAX_MB", "256"))
+    VECTOR_CACHE_MAX_DOCS = int(os.getenv("VECTOR_CACHE_MAX_DOCS", "32"))
+    VECTOR_CACHE_DIR = os.getenv("VECTOR_CACHE_DIR", "")  # set → vectors memory-mapped from .npy files here
+    # reload a doc after this long: bounds how stale a re-ingest seen by another worker can be
+    VECTOR_CACHE_TTL_S = float(os.getenv("VECTOR_CACHE_TTL_S", "300"))
 
 settings = Settings()
 print(f"[CONFIG] Loaded host={settings.DB_HOST} port={settings.DB_PORT} db={settings.DB_NAME} user={settings.DB_USER}")
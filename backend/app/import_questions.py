@@ -0,0 +1,53 @@
+# app/import_questions.py
+"""
+Bulk-load question banks exported by /questions/export (or a partner school's
+bank in the same shape) straight into the configured database.
+
+    # from backend/
+    python -m app.import_questions bank.csv
+    python -m app.import_questions staging_export.json partner.ndjson --report rejects.json
+    curl -s "$STAGING/questions/export?format=ndjson&limit=1000000" | \
+        python -m app.import_questions - --format ndjson
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from app.services import import_service
+from app.services.db import init_db
+
+
+def main(argv=None) -> None:
+    p = argparse.ArgumentParser(description="BioMentor bulk question import")
+    p.add_argument("files", nargs="+", help='CSV / JSON / NDJSON files ("-" for stdin, needs --format)')
+    p.add_argument("--format", choices=import_service.FORMATS, default=None,
+                   help="default: from the file extension, else sniffed from the content")
+    p.add_argument("--doc-id", default=None, help="source_doc_id for rows that have none")
+    p.add_argument("--report", default=None, help="write the full per-file reports (incl. rejected rows) here")
+    args = p.parse_args(argv)
+
+    init_db()
+    reports = {}
+    for name in args.files:
+        if name == "-":
+            if not args.format:
+                p.error("--format is required when reading stdin")
+            reports[name] = import_service.import_questions(
+                sys.stdin.buffer, args.format, default_doc_id=args.doc_id)
+            continue
+        with open(name, "rb") as f:
+            reports[name] = import_service.import_questions(
+                f, args.format, filename=Path(name).name, default_doc_id=args.doc_id)
+
+    for name, r in reports.items():
+        print(f"{name}: {r['inserted']} inserted, {r['duplicates']} already present, "
+              f"{r['rejected']} rejected ({r['rows_per_sec']} rows/s)")
+        for rej in r["rejected_rows"][:5]:
+            print(f"    row {rej['row']}: {rej['reason']}")
+    if args.report:
+        Path(args.report).write_text(json.dumps(reports, indent=2))
+
+
+if __name__ == "__main__":
+    main()
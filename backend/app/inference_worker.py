@@ -0,0 +1,76 @@
+# app/inference_worker.py
+"""
+Dedicated model worker: holds one copy of the LLM + embedder and serves
+generate/embed over local HTTP, so API processes stay thin.
+
+    # from backend/ — 2 worker processes, 4 torch threads each, one shared port
+    python -m app.inference_worker --port 8100 --workers 2 --threads 4
+
+    # API side (.env), any number of uvicorn --workers
+    INFERENCE_URLS=http://127.0.0.1:8100
+"""
+import argparse
+import os
+from typing import Any, Dict, List
+
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+
+from app.config import settings
+from app.services import inference
+
+inference.serve_locally()
+
+app = FastAPI(title="BioMentor Inference Worker")
+
+class GenerateReq(BaseModel):
+    prompt: str
+    kwargs: Dict[str, Any] = {}
+
+class EmbedReq(BaseModel):
+    texts: List[str]
+
+@app.on_event("startup")
+def _startup():
+    threads = settings.INFERENCE_THREADS
+    if threads > 0:
+        import torch
+        torch.set_num_threads(threads)
+    print(f"[WORKER] pid={os.getpid()} loading models (threads={threads or 'default'}) …")
+    inference.warmup()
+    print(f"[WORKER] pid={os.getpid()} ready.")
+
+@app.get("/health")
+def health():
+    return {"ok": True, "pid": os.getpid(), "model": settings.LLM_MODEL_ID}
+
+@app.post("/generate")
+def generate(body: GenerateReq):
+    unknown = set(body.kwargs) - inference.GENERATE_PARAMS
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"unsupported generation params: {sorted(unknown)}")
+    text, stats = inference.generate_local(body.prompt, **body.kwargs)
+    return {"text": text, "stats": stats}
+
+@app.post("/embed")
+def embed(body: EmbedReq):
+    vectors = inference.embed(body.texts)
+    return {"vectors": [[float(x) for x in v] for v in vectors]}
+
+def main():
+    import uvicorn
+
+    p = argparse.ArgumentParser(description="BioMentor inference worker")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8100)
+    p.add_argument("--workers", type=int, default=1, help="model processes (each loads one copy)")
+    p.add_argument("--threads", type=int, default=settings.INFERENCE_THREADS,
+                   help="torch threads per worker process (0 → torch default)")
+    args = p.parse_args()
+
+    # read by each worker process at startup
+    os.environ["INFERENCE_THREADS"] = str(args.threads)
+    uvicorn.run("app.inference_worker:app", host=args.host, port=args.port, workers=args.workers)
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,13 @@
 # app/main.py
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy import text
 from app.api import routes_ingest, routes_qgen
 from app.services.db import init_db, get_session
 from app.api import routes_questions  # add this
+from app.api import routes_admin
+from app.services import inference, ingestion_service, job_service, metrics
+from app.services.tracing import ProfilingMiddleware
 
 app = FastAPI(title="BioMentor API")
 
@@ -13,16 +16,26 @@ def _startup():
     print("[APP] startup: calling init_db() …")
     init_db()
     print("[APP] startup: init_db() done.")
+    inference.warmup()
+    print("[APP] startup: models loaded.")
+
+@app.on_event("startup")
+async def _start_jobs():
+    # resume interrupted generation jobs + sweep for orphaned ones
+    job_service.start_background()
 
 @app.on_event("shutdown")
 def _shutdown():
+    ingestion_service.shutdown()
     print("[APP] shutdown: bye 👋")
 
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000"],
     allow_credentials=True, allow_methods=["*"], allow_headers=["*"],
+    expose_headers=["X-Trace-Id"],
 )
+app.add_middleware(ProfilingMiddleware)
 
 @app.get("/health")
 def health():
@@ -42,24 +55,12 @@ def db_health():
     except Exception as e:
         return {"ok": False, "error": str(e)}
 
-@app.get("/questions/count")
-def questions_count():
-    with get_session() as s:
-        n = s.execute(text("SELECT COUNT(*) FROM questions")).scalar_one()
-        return {"count": n}
-
-@app.get("/questions/latest")
-def questions_latest(limit: int = 5):
-    with get_session() as s:
-        rows = s.execute(text("""
-            SELECT id::text, stem, answer, created_at
-            FROM questions
-            ORDER BY created_at DESC
-            LIMIT :lim
-        """), {"lim": limit}).mappings().all()
-        return {"items": list(rows)}
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE_LATEST)
 
 app.include_router(routes_ingest.router, prefix="/ingest", tags=["Ingestion"])
 app.include_router(routes_questions.router, prefix="/questions", tags=["Questions"])
 app.include_router(routes_qgen.router, prefix="/qgen", tags=["Question Generation"])
-print("[APP] Routers mounted: /ingest, /qgen")
+app.include_router(routes_admin.router, prefix="/admin", tags=["Admin"])
+print("[APP] Routers mounted: /ingest, /qgen, /admin")
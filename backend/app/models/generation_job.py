@@ -0,0 +1,29 @@
+# app/models/generation_job.py
+from sqlalchemy import Column, String, DateTime, Float, Integer, Text, func
+from sqlalchemy.dialects.postgresql import UUID
+from app.services.db import Base
+import uuid
+
+class GenerationJob(Base):
+    """Large batch generation run; progress is checkpointed after every accepted question."""
+    __tablename__ = "generation_jobs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    doc_id = Column(String, nullable=False)
+    query = Column(String(256), nullable=True)
+    k = Column(Integer, nullable=False, default=8)
+    group_id = Column(UUID(as_uuid=True), nullable=True, index=True)  # corpus-wide run this job belongs to
+
+    n_target = Column(Integer, nullable=False)
+    n_done = Column(Integer, nullable=False, default=0)
+    n_failed = Column(Integer, nullable=False, default=0)
+    status = Column(String(16), nullable=False, default="queued", index=True)  # queued|running|done|failed|cancelled
+    last_error = Column(Text, nullable=True)
+
+    owner = Column(String(128), nullable=True)                     # "<host>:<pid>" holding the lease
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+    active_seconds = Column(Float, nullable=False, default=0.0)    # time spent generating, across restarts
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,28 @@
+# app/models/pooled_question.py
+from sqlalchemy import Column, String, JSON, DateTime, func, Text, Index, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID
+from app.services.db import Base
+import uuid
+
+class PooledQuestion(Base):
+    """Pre-generated, validated question waiting to be served (see pool_service)."""
+    __tablename__ = "question_pool"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    source_doc_id = Column(String, nullable=False)
+    query = Column(String(256), nullable=True)     # topic focus used to generate; NULL = whole doc
+    stem_key = Column(String, nullable=False)      # normalized stem, for dedup
+
+    stem = Column(String, nullable=False)
+    options = Column(JSON, nullable=False)
+    answer = Column(String, nullable=False)
+    explanation = Column(Text, nullable=True)
+    difficulty = Column(String(16), nullable=True)
+    topic = Column(String(128), nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("source_doc_id", "stem_key", name="uq_question_pool_doc_stem"),
+        Index("ix_question_pool_doc_query", "source_doc_id", "query"),
+    )
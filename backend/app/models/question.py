@@ -1,5 +1,5 @@
 # app/models/question.py
-from sqlalchemy import Column, String, JSON, DateTime, func, Text
+from sqlalchemy import Column, String, JSON, DateTime, func, Text, Index
 from sqlalchemy.dialects.postgresql import UUID
 from app.services.db import Base
 import uuid
@@ -19,3 +19,11 @@ class Question(Base):
     topic = Column(String(128), nullable=True)     # short tag/topic
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # newest-first listing + max(created_at) validators for conditional GETs
+        Index("ix_questions_created_at", "created_at"),
+        Index("ix_questions_doc_created_at", "source_doc_id", "created_at"),
+    )
+    # Postgres also has `search_vector` (generated tsvector, GIN-indexed) for full-text
+    # search; it is created only by migration db355c58a46c, so it is not mapped here.
@@ -0,0 +1,23 @@
+# app/models/question_stat.py
+from sqlalchemy import Column, String, BigInteger, Index
+from app.services.db import Base
+
+class QuestionStat(Base):
+    """
+    Question counts, one row per value of each dimension: dim "doc" / "topic" /
+    "difficulty" keyed by that value (NULL stored as ''), plus one ("total", '')
+    row, and a ("version", '') change counter bumped by every write. Kept current
+    by statement-level triggers on `questions` that migration d04e871e6539
+    installs (Postgres only). Rows whose count dropped to 0 are kept (reads skip
+    them), so deletes never scan the table.
+    """
+    __tablename__ = "question_stats"
+
+    dim = Column(String(16), primary_key=True)
+    key = Column(String, primary_key=True, default="")
+    n = Column(BigInteger, nullable=False, default=0)
+
+    __table_args__ = (
+        # per-dimension "largest first" listings
+        Index("ix_question_stats_dim_n", "dim", "n"),
+    )
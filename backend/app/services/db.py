@@ -2,7 +2,7 @@
 from contextlib import contextmanager
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy.engine import URL
+from sqlalchemy.engine import URL, make_url
 
 from app.config import settings
 
@@ -10,18 +10,21 @@ from app.config import settings
 Base = declarative_base()
 
 # Fail fast if host is blank
-if not settings.DB_HOST:
+if not settings.DB_HOST and not settings.DATABASE_URL:
     raise RuntimeError("[DB] DB_HOST is empty! Check backend/.env")
 
-# Build URL safely (handles '@' in password)
-url = URL.create(
-    drivername="postgresql+psycopg",   # psycopg3
-    username=settings.DB_USER,
-    password=settings.DB_PASSWORD,
-    host=settings.DB_HOST,
-    port=settings.DB_PORT,
-    database=settings.DB_NAME,
-)
+if settings.DATABASE_URL:
+    url = make_url(settings.DATABASE_URL)
+else:
+    # Build URL safely (handles '@' in password)
+    url = URL.create(
+        drivername="postgresql+psycopg",   # psycopg3
+        username=settings.DB_USER,
+        password=settings.DB_PASSWORD,
+        host=settings.DB_HOST,
+        port=settings.DB_PORT,
+        database=settings.DB_NAME,
+    )
 
 def _mask(u: URL) -> str:
     user = (u.username or "") + (":" if u.username else "")
@@ -53,6 +56,9 @@ def init_db():
 
     # IMPORTANT: import models INSIDE this function to avoid circular imports
     import app.models.question  # noqa: F401
+    import app.models.pooled_question  # noqa: F401
+    import app.models.generation_job  # noqa: F401
+    import app.models.question_stat  # noqa: F401
 
     Base.metadata.create_all(bind=engine)
     print("[DB] init_db: tables ensured.")
@@ -0,0 +1,245 @@
+# app/services/inference.py
+"""
+Single seam for model access: the text-generation LLM and the embedder.
+
+Models load lazily on first use (or eagerly via warmup() at app startup), so
+importing the services is cheap. install() swaps in local stand-ins, which the
+benchmark suite uses to run without downloads.
+
+When INFERENCE_URLS is set, generate/embed calls are forwarded over HTTP to
+dedicated model worker processes (app/inference_worker.py) and no model is
+loaded in the API process.
+"""
+import itertools
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.services import metrics, tracing
+
+_lock = threading.Lock()
+_gen_lock = threading.Lock()  # one in-process generation at a time; they'd only fight for cores
+_force_local = False
+_tokenizer = None
+_pipe: Optional[Callable[..., List[Dict[str, Any]]]] = None
+_pipe_is_hf = False
+_embed_fn: Optional[Callable[[List[str]], List[List[float]]]] = None
+
+
+# ---- loading ------------------------------------------------------------------------
+
+def _load_llm() -> None:
+    global _tokenizer, _pipe, _pipe_is_hf
+    from transformers import AutoTokenizer, pipeline
+
+    print(f"[INFER] loading LLM {settings.LLM_MODEL_ID} …")
+    tok = AutoTokenizer.from_pretrained(settings.LLM_MODEL_ID)
+    # Ensure padding token exists to avoid warnings on some environments
+    if tok.pad_token_id is None and tok.eos_token_id is not None:
+        tok.pad_token_id = tok.eos_token_id
+    _pipe = pipeline(
+        task="text-generation",
+        model=settings.LLM_MODEL_ID,
+        tokenizer=tok,
+        device_map="auto",     # uses MPS on Apple Silicon, or CPU otherwise
+        torch_dtype="auto"
+    )
+    _tokenizer = tok
+    _pipe_is_hf = True
+
+
+def _load_embedder() -> None:
+    global _embed_fn
+    try:
+        from fastembed import TextEmbedding
+        emb = TextEmbedding()
+        _embed_fn = lambda texts: list(emb.embed(texts))
+    except Exception:
+        # fallback if fastembed/onnxruntime not available
+        from sentence_transformers import SentenceTransformer
+        st = SentenceTransformer("all-MiniLM-L6-v2")
+        _embed_fn = lambda texts: st.encode(texts, normalize_embeddings=True).tolist()
+
+
+def _ensure_llm() -> None:
+    if _pipe is None:
+        with _lock:
+            if _pipe is None:
+                _load_llm()
+
+
+def _ensure_embedder() -> None:
+    if _embed_fn is None:
+        with _lock:
+            if _embed_fn is None:
+                _load_embedder()
+
+
+def warmup() -> None:
+    """Load LLM + embedder now instead of on the first request (no-op when remote)."""
+    if _remote_urls():
+        print(f"[INFER] using remote inference workers: {', '.join(_remote_urls())}")
+        return
+    _ensure_embedder()
+    _ensure_llm()
+
+
+def serve_locally() -> None:
+    """Called by the inference worker: always run models in this process, never forward."""
+    global _force_local
+    _force_local = True
+
+
+# ---- remote workers -----------------------------------------------------------------
+
+_urls_cache: Optional[List[str]] = None
+_rr = None
+_rr_lock = threading.Lock()
+
+
+def _remote_urls() -> List[str]:
+    global _urls_cache, _rr
+    if _force_local:
+        return []
+    if _urls_cache is None:
+        with _rr_lock:
+            if _urls_cache is None:
+                urls = [u.strip().rstrip("/") for u in settings.INFERENCE_URLS.split(",") if u.strip()]
+                _rr = itertools.cycle(range(len(urls))) if urls else None
+                _urls_cache = urls  # publish last: readers that see the list also see _rr
+    return _urls_cache
+
+
+def _post(path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """POST JSON to the next worker (round-robin), failing over to the others."""
+    urls = _remote_urls()
+    with _rr_lock:
+        start = next(_rr)
+    body = json.dumps(payload).encode()
+    last_err: Optional[Exception] = None
+    for i in range(len(urls)):
+        url = urls[(start + i) % len(urls)] + path
+        req = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(req, timeout=settings.INFERENCE_TIMEOUT_S) as resp:
+                return json.loads(resp.read())
+        except urllib.error.HTTPError as e:
+            print(f"[INFER] worker {url} returned {e.code}; trying next")
+            last_err = RuntimeError(f"{url} returned {e.code}: {e.read()[:300]!r}")
+        except (urllib.error.URLError, OSError) as e:
+            print(f"[INFER] worker {url} unreachable ({e}); trying next")
+            last_err = e
+    raise RuntimeError(f"no inference worker succeeded: {last_err}")
+
+
+def install(*, generator=None, embedder=None, tokenizer=None) -> None:
+    """
+    Replace the backends with local stand-ins.
+    generator: pipeline-like callable, generator(prompt, **kw) -> [{"generated_text": str}]
+    embedder:  callable, embedder(list_of_texts) -> list of vectors
+    """
+    global _pipe, _pipe_is_hf, _embed_fn, _tokenizer
+    if generator is not None:
+        _pipe, _pipe_is_hf = generator, False
+    if embedder is not None:
+        _embed_fn = embedder
+    if tokenizer is not None:
+        _tokenizer = tokenizer
+
+
+# ---- generation ---------------------------------------------------------------------
+
+# generation parameters a caller (or a remote API process) may set; everything else
+# (streamers, stopping criteria, model/tokenizer overrides) stays server-side
+GENERATE_PARAMS = frozenset({
+    "max_new_tokens", "do_sample", "temperature", "top_p", "top_k",
+    "repetition_penalty", "return_full_text", "seed",
+})
+
+def _make_token_clock():
+    import torch
+    from transformers import StoppingCriteria
+
+    class _TokenClock(StoppingCriteria):
+        """Never stops generation; records when the first new token appears and how many follow."""
+
+        def __init__(self):
+            self.first_token_at: Optional[float] = None
+            self.steps = 0
+
+        def __call__(self, input_ids, scores, **kwargs):
+            if self.first_token_at is None:
+                self.first_token_at = time.perf_counter()
+            self.steps += 1
+            return torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+
+    return _TokenClock()
+
+
+def count_tokens(text: str) -> int:
+    if _tokenizer is None:
+        return len(text.split())
+    return len(_tokenizer(text)["input_ids"])
+
+
+def generate_local(prompt: str, **kwargs) -> Tuple[str, Dict[str, Any]]:
+    """
+    Generate in this process. Returns (text, stats) with token counts and prefill/decode seconds.
+    `seed` makes sampling reproducible (the HF pipeline is seeded under the generation
+    lock; stand-ins receive it as a kwarg).
+    """
+    _ensure_llm()
+    clock = None
+    seed = kwargs.pop("seed", None) if _pipe_is_hf else None
+    if _pipe_is_hf:
+        from transformers import StoppingCriteriaList
+        clock = _make_token_clock()
+        kwargs["stopping_criteria"] = StoppingCriteriaList([clock])
+    prompt_tokens = count_tokens(prompt)
+    with _gen_lock:
+        if seed is not None:
+            from transformers import set_seed
+            set_seed(seed)
+        t0 = time.perf_counter()
+        out = _pipe(prompt, **kwargs)[0]["generated_text"]
+        total = time.perf_counter() - t0
+    if clock is not None and clock.first_token_at:
+        prefill, steps = clock.first_token_at - t0, clock.steps
+    else:
+        prefill, steps = total, count_tokens(out)
+    return out, {"prompt_tokens": prompt_tokens, "new_tokens": steps,
+                 "prefill_s": prefill, "decode_s": total - prefill}
+
+
+def generate_text(prompt: str, **kwargs) -> str:
+    """Generate (locally or on a worker) and record prefill/decode timings + token counts."""
+    remote = bool(_remote_urls())
+    with tracing.span("llm.generate", remote=remote, max_new_tokens=kwargs.get("max_new_tokens")) as sp:
+        if remote:
+            resp = _post("/generate", {"prompt": prompt, "kwargs": kwargs})
+            out, stats = resp["text"], resp["stats"]
+        else:
+            out, stats = generate_local(prompt, **kwargs)
+        sp.set(prompt_tokens=stats["prompt_tokens"], new_tokens=stats["new_tokens"],
+               prefill_ms=round(stats["prefill_s"] * 1000, 3),
+               decode_ms=round(stats["decode_s"] * 1000, 3))
+    metrics.observe_generation(stats["prompt_tokens"], stats["new_tokens"],
+                               stats["prefill_s"], stats["decode_s"])
+    return out
+
+
+# ---- embeddings ---------------------------------------------------------------------
+
+def embed(texts: List[str]) -> List[List[float]]:
+    if _remote_urls():
+        return _post("/embed", {"texts": texts})["vectors"]
+    _ensure_embedder()
+    return _embed_fn(texts)
+
+
+def embed_one(text: str) -> List[float]:
+    return embed([text])[0]
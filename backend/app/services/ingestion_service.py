@@ -1,16 +1,24 @@
+import asyncio
+import concurrent.futures
+import multiprocessing
+import os
+import tempfile
+import time
 import uuid
+from concurrent.futures import ProcessPoolExecutor
 import fitz  # PyMuPDF
-from typing import List, Dict
-from fastembed import TextEmbedding
-import qdrant_client
-from qdrant_client.models import Distance, VectorParams, PointStruct
+from typing import Any, List, Dict, Optional, Tuple
+from qdrant_client.models import (
+    Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchValue, FilterSelector,
+)
 
-COLLECTION = "notes"
-EMBED_DIM = 384  # fastembed default
+from app.config import settings
+from app.services import inference, metrics, pool_service, qgen_service, tracing
+from app.services.pdf_extract import _chunk_plain_text, extract_shard, page_chunks  # noqa: F401
+from app.services.vector_store import COLLECTION, EMBED_DIM, get_qdrant
 
 # singletons
-_embedder = TextEmbedding()
-_qdrant = qdrant_client.QdrantClient(host="127.0.0.1", port=6333)
+_qdrant = get_qdrant()
 
 def _ensure_collection():
     try:
@@ -20,30 +28,99 @@ def _ensure_collection():
             COLLECTION,
             vectors_config=VectorParams(size=EMBED_DIM, distance=Distance.COSINE),
         )
-def _chunk_plain_text(text: str) -> List[str]:
-    # simple MVP splitter: sentence-ish by periods; trim empties
-    parts = [p.strip() for p in text.split(".") if p.strip()]
-    # keep short chunks reasonable
-    return [p if p.endswith(".") else p + "." for p in parts]
 
-async def ingest_pdf(file) -> Dict[str, str]:
+# Page extraction process pool (spawned lazily; "spawn" so workers don't inherit model threads)
+_pool: Optional[ProcessPoolExecutor] = None
+
+def _extract_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.INGEST_WORKERS or os.cpu_count() or 1,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+def shutdown() -> None:
+    """Stop the extraction workers (app shutdown); queued shards are dropped."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+def _embed_chunks(chunks: List[Dict]) -> List[Any]:
+    with tracing.span("embed", source="ingest", texts=len(chunks)), \
+            metrics.EMBED_SECONDS.labels(source="ingest").time():
+        return inference.embed([c["text"] for c in chunks])
+
+async def _extract_and_embed(data: bytes) -> Tuple[int, List[Dict], List[Any]]:
+    """
+    Extract chunks page-shard by page-shard across the process pool, re-assembled in
+    page order; each shard is embedded (in a thread) while later shards are still
+    being extracted. Small PDFs / INGEST_WORKERS=1 stay in-process.
+    """
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        page_count = doc.page_count
+        if settings.INGEST_WORKERS == 1 or page_count <= settings.INGEST_PAGES_PER_SHARD:
+            with tracing.span("pdf.extract", pages=page_count, shards=1):
+                chunks = await asyncio.to_thread(page_chunks, doc, 0, page_count)
+            vectors = await asyncio.to_thread(_embed_chunks, chunks) if chunks else []
+            return page_count, chunks, vectors
+
+    # workers open the document by path
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        pool = _extract_pool()
+        step = settings.INGEST_PAGES_PER_SHARD
+        shards = [
+            pool.submit(extract_shard, path, start, min(start + step, page_count))
+            for start in range(0, page_count, step)
+        ]
+        chunks: List[Dict] = []
+        vectors: List[Any] = []
+        pending: Optional[asyncio.Future] = None  # one embed in flight, overlapping extraction
+        try:
+            with tracing.span("pdf.extract", pages=page_count, shards=len(shards)):
+                for shard in shards:
+                    shard_chunks = await asyncio.wrap_future(shard)
+                    if pending is not None:
+                        vectors.extend(await pending)
+                        pending = None
+                    if shard_chunks:
+                        chunks.extend(shard_chunks)
+                        pending = asyncio.ensure_future(asyncio.to_thread(_embed_chunks, shard_chunks))
+                if pending is not None:
+                    vectors.extend(await pending)
+        except BaseException:
+            # a shard failed (or we were cancelled): drop queued shards, and let the ones
+            # already running finish (their errors retrieved) before the file goes away
+            for shard in shards:
+                shard.cancel()
+            await asyncio.to_thread(concurrent.futures.wait, shards)
+            for shard in shards:
+                if not shard.cancelled():
+                    shard.exception()
+            if pending is not None:
+                await asyncio.gather(pending, return_exceptions=True)
+            raise
+        return page_count, chunks, vectors
+    finally:
+        os.unlink(path)
+
+async def ingest_pdf(file, doc_id: Optional[str] = None) -> Dict[str, str]:
+    """Index a PDF. Passing an existing doc_id re-ingests it: old chunks are replaced."""
     _ensure_collection()
     data = await file.read()
-    doc = fitz.open(stream=data, filetype="pdf")
-
-    chunks = []
-    for page_no, page in enumerate(doc, start=1):
-        t = page.get_text("text")
-        if not t:
-            continue
-        for idx, chunk in enumerate(_chunk_plain_text(t)):
-            chunks.append({"page": page_no, "idx": idx, "text": chunk})
+    t0 = time.perf_counter()
+    page_count, chunks, vectors = await _extract_and_embed(data)
 
     if not chunks:
         return {"docId": None, "count": 0}
 
-    vectors = list(_embedder.embed([c["text"] for c in chunks]))
-    doc_id = str(uuid.uuid4())
+    replacing = doc_id is not None
+    doc_id = doc_id or str(uuid.uuid4())
 
     points = [
     PointStruct(
@@ -53,5 +130,22 @@ async def ingest_pdf(file) -> Dict[str, str]:
     )
     for i, (vec, c) in enumerate(zip(vectors, chunks))
 ]
-    _qdrant.upsert(collection_name=COLLECTION, points=points)
+    if replacing:
+        flt = Filter(must=[FieldCondition(key="doc_id", match=MatchValue(value=doc_id))])
+        with tracing.span("qdrant.delete", doc_id=doc_id), metrics.QDRANT_SECONDS.labels(op="delete").time():
+            _qdrant.delete(collection_name=COLLECTION, points_selector=FilterSelector(filter=flt))
+    with tracing.span("qdrant.upsert", points=len(points)), metrics.QDRANT_SECONDS.labels(op="upsert").time():
+        _qdrant.upsert(collection_name=COLLECTION, points=points)
+
+    elapsed = time.perf_counter() - t0
+    metrics.INGEST_PAGES.inc(page_count)
+    if elapsed > 0:
+        metrics.INGEST_PAGES_PER_SECOND.observe(page_count / elapsed)
+    if replacing:
+        # local to this process; other API workers drop their copies within
+        # COALESCE_TTL_S (results, page layouts) and VECTOR_CACHE_TTL_S (vector cache)
+        qgen_service.invalidate_doc(doc_id)
+        # pooled questions were generated from the old text
+        dropped = await asyncio.to_thread(pool_service.discard_doc, doc_id)
+        print(f"[INGEST] re-ingested {doc_id}: dropped {dropped} pooled questions")
     return {"docId": doc_id, "count": len(points)}
\ No newline at end of file
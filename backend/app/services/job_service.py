@@ -0,0 +1,495 @@
+# app/services/job_service.py
+"""
+Resumable, checkpointed large batch generation.
+
+Each accepted question is inserted together with the job's progress (n_done) in
+one transaction, so a crash loses at most the item in flight; the dedup set is
+rebuilt from the doc's saved (and pooled) questions when a job (re)starts.
+A process runs a job only while it holds the job's lease (owner + heartbeat_at,
+refreshed every JOB_LEASE_S / 3 while the job runs, however long one item takes);
+a periodic sweep in every API process picks up queued jobs and jobs whose owner
+stopped heart-beating, so work resumes after a crash or restart.
+
+A corpus-wide run is a group of per-document jobs sharing a group_id. Jobs of a
+group run in parallel up to JOB_MAX_CONCURRENT per process (the next queued job
+starts as soon as one finishes) and, within a process, share one dedup set so a
+stem accepted for one document is not generated again for another.
+"""
+import asyncio
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Set
+
+from fastapi import HTTPException
+from sqlalchemy import or_, select, update
+
+from app.config import settings
+from app.models.generation_job import GenerationJob
+from app.models.question import Question
+from app.services import metrics, pool_service, qgen_service
+from app.services.db import get_session
+
+OWNER = f"{socket.gethostname()}:{os.getpid()}"
+ACTIVE = ("queued", "running")
+
+_running: Set[str] = set()
+_tasks: Set[asyncio.Task] = set()
+_sweeper: Optional[asyncio.Task] = None
+_group_seen: Dict[str, Set[str]] = {}   # group_id → normalized stems accepted across the group
+_job_group: Dict[str, str] = {}         # running job_id → group_id
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _as_uuid(job_id: str) -> uuid.UUID:
+    try:
+        return uuid.UUID(str(job_id))
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+
+# ---- status -------------------------------------------------------------------------
+
+def job_to_dict(job: GenerationJob) -> Dict[str, Any]:
+    rate = job.n_done / job.active_seconds if job.active_seconds else None
+    remaining = max(job.n_target - job.n_done, 0)
+    return {
+        "id": str(job.id),
+        "docId": job.doc_id,
+        "query": job.query,
+        "k": job.k,
+        "group_id": str(job.group_id) if job.group_id else None,
+        "status": job.status,
+        "n_target": job.n_target,
+        "n_done": job.n_done,
+        "n_failed": job.n_failed,
+        "last_error": job.last_error,
+        "throughput_per_hour": rate * 3600 if rate else None,
+        "eta_seconds": (remaining / rate) if rate and job.status in ACTIVE else None,
+        "active_seconds": round(job.active_seconds or 0.0, 1),
+        "owner": job.owner,
+        "heartbeat_at": job.heartbeat_at,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+def get_job(job_id: str) -> Dict[str, Any]:
+    with get_session() as s:
+        job = s.get(GenerationJob, _as_uuid(job_id))
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return job_to_dict(job)
+
+
+def list_jobs(limit: int = 20, status: Optional[str] = None) -> List[Dict[str, Any]]:
+    with get_session() as s:
+        stmt = select(GenerationJob).order_by(GenerationJob.created_at.desc()).limit(limit)
+        if status:
+            stmt = stmt.where(GenerationJob.status == status)
+        return [job_to_dict(j) for j in s.execute(stmt).scalars().all()]
+
+
+def _group_status(statuses: List[str]) -> str:
+    if any(st in ACTIVE for st in statuses):
+        return "running" if "running" in statuses else "queued"
+    if all(st == "done" for st in statuses):
+        return "done"
+    if all(st == "cancelled" for st in statuses):
+        return "cancelled"
+    return "partial" if "done" in statuses else "failed"
+
+
+def _aware(ts: Optional[datetime]) -> Optional[datetime]:
+    # SQLite hands back naive datetimes
+    return ts.replace(tzinfo=timezone.utc) if ts is not None and ts.tzinfo is None else ts
+
+
+def get_group(group_id: str) -> Dict[str, Any]:
+    with get_session() as s:
+        jobs = s.execute(
+            select(GenerationJob)
+            .where(GenerationJob.group_id == _as_uuid(group_id))
+            .order_by(GenerationJob.created_at)
+        ).scalars().all()
+        if not jobs:
+            raise HTTPException(status_code=404, detail="Job group not found")
+        items = [job_to_dict(j) for j in jobs]
+
+    status = _group_status([j["status"] for j in items])
+    n_target = sum(j["n_target"] for j in items)
+    n_done = sum(j["n_done"] for j in items)
+    started = [_aware(j["started_at"]) for j in items if j["started_at"]]
+    finished = [_aware(j["finished_at"]) for j in items if j["finished_at"]]
+    # wall-clock rate: jobs run in parallel, so per-job rates do not add up to elapsed time
+    end = max(finished) if status not in ACTIVE and finished else _now()
+    wall = (end - min(started)).total_seconds() if started else 0.0
+    rate = n_done / wall if wall > 0 else None
+    return {
+        "group_id": group_id,
+        "status": status,
+        "docs": len(items),
+        "n_target": n_target,
+        "n_done": n_done,
+        "n_failed": sum(j["n_failed"] for j in items),
+        "by_status": {st: sum(1 for j in items if j["status"] == st) for st in {j["status"] for j in items}},
+        "throughput_per_hour": rate * 3600 if rate else None,
+        "eta_seconds": (max(n_target - n_done, 0) / rate) if rate and status in ACTIVE else None,
+        "wall_seconds": round(wall, 1),
+        "jobs": items,
+    }
+
+
+# ---- lifecycle ----------------------------------------------------------------------
+
+def _insert_job(doc_id: str, n: int, query: Optional[str], k: int) -> Dict[str, Any]:
+    with get_session() as s:
+        job = GenerationJob(doc_id=doc_id, query=query, k=k, n_target=n, n_done=0, n_failed=0,
+                            status="queued", active_seconds=0.0)
+        s.add(job)
+        s.commit()
+        s.refresh(job)
+        return job_to_dict(job)
+
+
+async def create_job(doc_id: str, n: int, *, query: Optional[str] = None, k: int = 8) -> Dict[str, Any]:
+    out = await asyncio.to_thread(_insert_job, doc_id, n, query, k)
+    await start_job(out["id"])
+    return out
+
+
+def _split_quota(total: int, weights: List[float]) -> List[int]:
+    """Largest-remainder split of `total` proportionally to `weights`."""
+    w = sum(weights)
+    exact = [total * x / w for x in weights]
+    out = [int(e) for e in exact]
+    for i in sorted(range(len(exact)), key=lambda i: exact[i] - out[i], reverse=True)[: total - sum(out)]:
+        out[i] += 1
+    return out
+
+
+def plan_corpus(doc_ids: Optional[List[str]], topic: Optional[str], *, per_doc: Optional[int] = None,
+                total: Optional[int] = None, max_docs: int = 50) -> List[Dict[str, Any]]:
+    """
+    Specs for create_group. Explicit docIds get per_doc each (or an even split of
+    total); with only a topic, relevant docs are discovered and total is split by
+    how many of the topic's top hits each doc holds. The topic, if any, becomes
+    every job's retrieval query.
+    """
+    if (per_doc is None) == (total is None):
+        raise HTTPException(status_code=422, detail="Give exactly one of perDoc or total")
+    if doc_ids:
+        docs = list(dict.fromkeys(doc_ids))
+        weights = [1.0] * len(docs)
+    elif topic:
+        found = qgen_service.discover_docs(topic, max_docs=max_docs)
+        if not found:
+            raise HTTPException(status_code=404, detail=f"No documents match topic {topic!r}")
+        docs = [d["docId"] for d in found]
+        weights = [float(d["hits"]) for d in found]
+    else:
+        raise HTTPException(status_code=422, detail="Give docIds or a topic")
+
+    quotas = [per_doc] * len(docs) if per_doc is not None else _split_quota(total, weights)
+    return [{"docId": d, "n": n, "query": topic} for d, n in zip(docs, quotas) if n > 0]
+
+
+def _insert_group(group_id: uuid.UUID, specs: List[Dict[str, Any]], k: int) -> List[str]:
+    with get_session() as s:
+        jobs = [
+            GenerationJob(doc_id=sp["docId"], query=sp.get("query"), k=k, n_target=sp["n"],
+                          n_done=0, n_failed=0, status="queued", active_seconds=0.0,
+                          group_id=group_id)
+            for sp in specs
+        ]
+        s.add_all(jobs)
+        s.commit()
+        return [str(j.id) for j in jobs]
+
+
+async def create_group(specs: List[Dict[str, Any]], *, k: int = 8) -> Dict[str, Any]:
+    """
+    One job per spec ({"docId", "n", "query"}) under a shared group_id, inserted
+    in one transaction; as many as there are free slots start right away.
+    """
+    group_id = uuid.uuid4()
+    ids = await asyncio.to_thread(_insert_group, group_id, specs, k)
+    for job_id in ids:
+        if not await start_job(job_id) and len(_running) >= settings.JOB_MAX_CONCURRENT:
+            break
+    print(f"[JOB] group {group_id}: {len(ids)} docs queued, {sum(1 for i in ids if i in _running)} started")
+    return await asyncio.to_thread(get_group, str(group_id))
+
+
+def cancel_group(group_id: str) -> Dict[str, Any]:
+    with get_session() as s:
+        s.execute(
+            update(GenerationJob)
+            .where(GenerationJob.group_id == _as_uuid(group_id))
+            .where(GenerationJob.status.in_(ACTIVE))
+            .values(status="cancelled", finished_at=_now())
+        )
+        s.commit()
+    return get_group(group_id)
+
+
+def cancel_job(job_id: str) -> Dict[str, Any]:
+    with get_session() as s:
+        job = s.get(GenerationJob, _as_uuid(job_id))
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        if job.status in ACTIVE:
+            job.status = "cancelled"
+            job.finished_at = _now()
+            s.commit()
+            s.refresh(job)
+        return job_to_dict(job)
+
+
+def _claim(job_id: str) -> bool:
+    """Take the lease if the job is active and unowned, ours, or stale."""
+    stale = _now() - timedelta(seconds=settings.JOB_LEASE_S)
+    with get_session() as s:
+        res = s.execute(
+            update(GenerationJob)
+            .where(GenerationJob.id == _as_uuid(job_id))
+            .where(GenerationJob.status.in_(ACTIVE))
+            .where(or_(GenerationJob.owner.is_(None),
+                       GenerationJob.owner == OWNER,
+                       GenerationJob.heartbeat_at < stale))
+            .values(owner=OWNER, heartbeat_at=_now(), status="running")
+        )
+        s.commit()
+        return res.rowcount == 1
+
+
+async def start_job(job_id: str) -> bool:
+    """Run the job on this process's event loop if we can claim it (the claim runs in a thread)."""
+    if job_id in _running or len(_running) >= settings.JOB_MAX_CONCURRENT:
+        return False  # queued jobs are picked up by the sweep when a slot frees up
+    _running.add(job_id)  # hold the slot while claiming, so a concurrent start can't take it too
+    try:
+        claimed = await asyncio.to_thread(_claim, job_id)
+    except BaseException:
+        _running.discard(job_id)
+        raise
+    if not claimed:
+        _running.discard(job_id)
+        return False
+    task = asyncio.get_running_loop().create_task(_run(job_id))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return True
+
+
+# ---- runner -------------------------------------------------------------------------
+
+def _checkpoint(job_id: str, item: Optional[Dict[str, Any]],
+                elapsed: float, error: Optional[str] = None) -> Optional[str]:
+    """
+    Persist one step atomically: the accepted question (if any) + counters +
+    heartbeat. Returns the job's status, or None if we lost the lease. Nothing is
+    written once the job left "running" (e.g. cancelled while the item was generated).
+    """
+    with get_session() as s:
+        job = s.execute(
+            select(GenerationJob).where(GenerationJob.id == _as_uuid(job_id)).with_for_update()
+        ).scalar_one()
+        if job.owner != OWNER:
+            return None
+        if job.status != "running":
+            return job.status
+        if item is not None:
+            s.add(Question(
+                stem=item["stem"], options=item["options"], answer=item["answer"],
+                explanation=item["explanation"], difficulty=item["difficulty"],
+                topic=item["topic"], source_doc_id=job.doc_id,
+            ))
+            job.n_done += 1
+        if error is not None:
+            job.n_failed += 1
+            job.last_error = error
+        job.active_seconds = (job.active_seconds or 0.0) + elapsed
+        job.heartbeat_at = _now()
+        if job.n_done >= job.n_target:
+            job.status = "done"
+            job.finished_at = _now()
+        with metrics.DB_WRITE_SECONDS.labels(op="job_checkpoint").time():
+            s.commit()
+        return job.status
+
+
+def _finish(job_id: str, status: str, error: Optional[str] = None) -> None:
+    values: Dict[str, Any] = {"status": status, "finished_at": _now()}
+    if error is not None:
+        values["last_error"] = error
+    with get_session() as s:
+        s.execute(
+            update(GenerationJob)
+            .where(GenerationJob.id == _as_uuid(job_id))
+            .where(GenerationJob.owner == OWNER)
+            .where(GenerationJob.status == "running")
+            .values(**values)
+        )
+        s.commit()
+
+
+def _heartbeat(job_id: str) -> None:
+    with get_session() as s:
+        s.execute(
+            update(GenerationJob)
+            .where(GenerationJob.id == _as_uuid(job_id))
+            .where(GenerationJob.owner == OWNER)
+            .where(GenerationJob.status == "running")
+            .values(heartbeat_at=_now())
+        )
+        s.commit()
+
+
+async def _keep_lease(job_id: str) -> None:
+    """Renew the lease on a timer, so a slow item can't make a live job look orphaned."""
+    while True:
+        await asyncio.sleep(settings.JOB_LEASE_S / 3)
+        try:
+            await asyncio.to_thread(_heartbeat, job_id)
+        except Exception as e:
+            print(f"[JOB] {job_id} heartbeat failed: {e}")
+
+
+def _known_stems(doc_ids: List[str]) -> Set[str]:
+    """Normalized stems already saved (or pooled) for these docs: the dedup set to resume from."""
+    return set().union(*(pool_service._known_stem_keys(d) for d in doc_ids))
+
+
+def _group_seen_for(job_id: str, group_id: str) -> Set[str]:
+    """The group's shared dedup set; seeded from every member doc's questions."""
+    shared = _group_seen.get(group_id)
+    if shared is None:
+        with get_session() as s:
+            docs = s.execute(
+                select(GenerationJob.doc_id).distinct().where(GenerationJob.group_id == _as_uuid(group_id))
+            ).scalars().all()
+        shared = _group_seen[group_id] = _known_stems(docs)
+    _job_group[job_id] = group_id
+    return shared
+
+
+def _begin(job_id: str):
+    """(doc_id, query, k, group_id, remaining) of a claimed job; stamps started_at on the first run."""
+    with get_session() as s:
+        job = s.get(GenerationJob, _as_uuid(job_id))
+        if job.started_at is None:
+            job.started_at = _now()
+            s.commit()
+        group_id = str(job.group_id) if job.group_id else None
+        return job.doc_id, job.query, job.k, group_id, job.n_target - job.n_done
+
+
+async def _run(job_id: str) -> None:
+    crashed = False
+    lease = asyncio.get_running_loop().create_task(_keep_lease(job_id))
+    try:
+        doc_id, query, k, group_id, remaining = await asyncio.to_thread(_begin, job_id)
+        print(f"[JOB] {job_id} running on {OWNER}: {remaining} to go")
+        if remaining <= 0:
+            await asyncio.to_thread(_finish, job_id, "done")
+            return
+
+        if group_id:
+            seen = await asyncio.to_thread(_group_seen_for, job_id, group_id)
+        else:
+            seen = await asyncio.to_thread(_known_stems, [doc_id])
+        consecutive_failures = 0
+        status: Optional[str] = "running"
+        while status == "running":
+            t0 = time.perf_counter()
+            item, error = None, None
+            try:
+                out = await qgen_service.generate_batch_from_doc(doc_id, 1, query=query, k=k, seen=seen)
+                if out:
+                    cand = qgen_service._normalize(dict(out[0]))
+                    ok, why = qgen_service._is_valid(cand)
+                    if ok:
+                        item = cand
+                    else:
+                        error = f"quality gate: {why}"
+                else:
+                    error = "gave up after retries (duplicates/invalid output)"
+            except HTTPException as e:
+                error = str(e.detail)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+
+            # generate_batch_from_doc already added an accepted stem to `seen`
+            consecutive_failures = 0 if item is not None else consecutive_failures + 1
+            status = await asyncio.to_thread(
+                _checkpoint, job_id, item, time.perf_counter() - t0, error
+            )
+            if status == "running" and consecutive_failures >= settings.JOB_MAX_CONSECUTIVE_FAILURES:
+                await asyncio.to_thread(
+                    _finish, job_id, "failed", f"{consecutive_failures} consecutive failures; last: {error}"
+                )
+                status = "failed"
+        print(f"[JOB] {job_id} stopped: {status or 'lease lost'}")
+    except Exception as e:
+        crashed = True
+        print(f"[JOB] {job_id} crashed: {e}; it will be resumed by the next sweep")
+    finally:
+        lease.cancel()
+        _running.discard(job_id)
+        group_id = _job_group.pop(job_id, None)
+        if group_id and group_id not in _job_group.values():
+            _group_seen.pop(group_id, None)  # re-seeded from the DB if more of the group runs here
+        if not crashed:
+            # hand the freed slot to the next queued job instead of waiting for the sweep
+            task = asyncio.get_running_loop().create_task(_fill_slots())
+            _tasks.add(task)
+            task.add_done_callback(_tasks.discard)
+
+
+# ---- resume -------------------------------------------------------------------------
+
+def _resumable_ids() -> List[str]:
+    stale = _now() - timedelta(seconds=settings.JOB_LEASE_S)
+    with get_session() as s:
+        rows = s.execute(
+            select(GenerationJob.id)
+            .where(GenerationJob.status.in_(ACTIVE))
+            .where(or_(GenerationJob.owner.is_(None),
+                       GenerationJob.owner == OWNER,
+                       GenerationJob.heartbeat_at < stale))
+            .order_by(GenerationJob.created_at)
+        ).scalars().all()
+    return [str(r) for r in rows]
+
+
+async def _fill_slots() -> None:
+    """Start queued/orphaned jobs until this process has no free slot left."""
+    if len(_running) >= settings.JOB_MAX_CONCURRENT:
+        return
+    try:
+        for job_id in await asyncio.to_thread(_resumable_ids):
+            if len(_running) >= settings.JOB_MAX_CONCURRENT:
+                break
+            await start_job(job_id)
+    except Exception as e:
+        print(f"[JOB] sweep failed: {e}")
+
+
+async def _sweep_forever() -> None:
+    while True:
+        await _fill_slots()
+        await asyncio.sleep(settings.JOB_SWEEP_S)
+
+
+def start_background() -> None:
+    """Called on app startup: resume interrupted jobs now and keep sweeping for orphans."""
+    global _sweeper
+    if _sweeper is None:
+        _sweeper = asyncio.get_running_loop().create_task(_sweep_forever())
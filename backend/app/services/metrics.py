@@ -0,0 +1,90 @@
+# app/services/metrics.py
+"""
+Prometheus instrumentation for the request path. Exposed on GET /metrics.
+
+All metrics are process-local; when running uvicorn with several workers set
+PROMETHEUS_MULTIPROC_DIR so /metrics aggregates across processes.
+"""
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+)
+
+_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+_LLM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32, 64, 128)
+_TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+_RATE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+# ---- retrieval ----------------------------------------------------------------------
+EMBED_SECONDS = Histogram(
+    "biomentor_embed_seconds", "Time spent embedding text", ["source"], buckets=_LATENCY_BUCKETS
+)
+QDRANT_SECONDS = Histogram(
+    "biomentor_qdrant_seconds", "Qdrant call latency", ["op"], buckets=_LATENCY_BUCKETS
+)
+
+# ---- generation ---------------------------------------------------------------------
+PROMPT_TOKENS = Histogram(
+    "biomentor_prompt_tokens", "Prompt length in tokens", buckets=_TOKEN_BUCKETS
+)
+GENERATED_TOKENS = Histogram(
+    "biomentor_generated_tokens", "New tokens per generate call", buckets=_TOKEN_BUCKETS
+)
+PREFILL_SECONDS = Histogram(
+    "biomentor_generate_prefill_seconds", "Time to first token", buckets=_LLM_BUCKETS
+)
+DECODE_SECONDS = Histogram(
+    "biomentor_generate_decode_seconds", "Time after first token", buckets=_LLM_BUCKETS
+)
+DECODE_TOKENS_PER_SECOND = Histogram(
+    "biomentor_generate_decode_tokens_per_second", "Decode throughput", buckets=_RATE_BUCKETS
+)
+PARSE_FAILURES = Counter(
+    "biomentor_parse_failures_total", "Model outputs that were not parseable JSON"
+)
+QUALITY_REJECTIONS = Counter(
+    "biomentor_quality_rejections_total", "Items rejected by the quality gate", ["reason"]
+)
+COALESCE_EVENTS = Counter(
+    "biomentor_coalesce_total", "Coalesced retrieval/generation lookups", ["kind"]
+)
+DUPLICATE_RETRIES = Counter(
+    "biomentor_duplicate_retries_total", "Batch retries caused by a duplicate stem"
+)
+
+POOL_SERVED = Counter("biomentor_pool_served_total", "Questions served from the pre-generated pool")
+POOL_DEPOSITED = Counter("biomentor_pool_deposited_total", "Questions added to the pre-generated pool")
+
+# ---- persistence / ingest -----------------------------------------------------------
+DB_WRITE_SECONDS = Histogram(
+    "biomentor_db_write_seconds", "DB write latency", ["op"], buckets=_LATENCY_BUCKETS
+)
+INGEST_PAGES = Counter("biomentor_ingest_pages_total", "PDF pages ingested")
+INGEST_PAGES_PER_SECOND = Histogram(
+    "biomentor_ingest_pages_per_second", "Ingest throughput per upload", buckets=_RATE_BUCKETS
+)
+
+
+def observe_generation(prompt_tokens: int, new_tokens: int, prefill_s: float, decode_s: float) -> None:
+    PROMPT_TOKENS.observe(prompt_tokens)
+    GENERATED_TOKENS.observe(new_tokens)
+    PREFILL_SECONDS.observe(prefill_s)
+    DECODE_SECONDS.observe(decode_s)
+    if decode_s > 0 and new_tokens > 1:
+        DECODE_TOKENS_PER_SECOND.observe((new_tokens - 1) / decode_s)
+
+
+def render() -> bytes:
+    """Serialize all metrics in the Prometheus text format."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest()
+
@@ -0,0 +1,33 @@
+# app/services/pdf_extract.py
+"""
+PDF page → chunk extraction. Kept dependency-light (PyMuPDF only) because it is
+imported by the ingest process-pool workers.
+"""
+from typing import Dict, List
+
+import fitz  # PyMuPDF
+
+
+def _chunk_plain_text(text: str) -> List[str]:
+    # simple MVP splitter: sentence-ish by periods; trim empties
+    parts = [p.strip() for p in text.split(".") if p.strip()]
+    # keep short chunks reasonable
+    return [p if p.endswith(".") else p + "." for p in parts]
+
+
+def page_chunks(doc: "fitz.Document", start: int, end: int) -> List[Dict]:
+    """Chunks for pages [start, end) (0-based), with 1-based page numbers, in page order."""
+    chunks = []
+    for page_no in range(start, end):
+        t = doc[page_no].get_text("text")
+        if not t:
+            continue
+        for idx, chunk in enumerate(_chunk_plain_text(t)):
+            chunks.append({"page": page_no + 1, "idx": idx, "text": chunk})
+    return chunks
+
+
+def extract_shard(path: str, start: int, end: int) -> List[Dict]:
+    """Process-pool entry point: open the PDF by path and extract one page range."""
+    with fitz.open(path) as doc:
+        return page_chunks(doc, start, end)
@@ -0,0 +1,180 @@
+# app/services/pool_service.py
+"""
+Per-document pool of pre-generated, validated, deduplicated questions.
+
+After ingest (and whenever a pool drops below POOL_LOW_WATER) a background task
+generates questions until the pool reaches POOL_HIGH_WATER. Pools are keyed by
+(doc_id, query): query=None is the whole-document pool, a query is a topic pool
+that is created the first time that topic is requested.
+/qgen/from_doc_batch_and_save serves from the pool first and only generates the
+shortfall: it peeks at what the pool holds, generates the rest, then claims the
+pooled rows and saves the generated ones in one transaction, so a failed request
+never consumes pool rows. Re-ingesting a document drops all of its pools.
+"""
+import asyncio
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.exc import IntegrityError
+
+from app.config import settings
+from app.models.pooled_question import PooledQuestion
+from app.models.question import Question
+from app.services import metrics, qgen_service
+from app.services.db import get_session
+from app.services.singleflight import norm_query
+
+_refilling: Set[Tuple[str, Optional[str]]] = set()
+_tasks: Set[asyncio.Task] = set()
+
+
+def enabled() -> bool:
+    return settings.POOL_ENABLED
+
+
+def _pool_filter(stmt, doc_id: str, query: Optional[str]):
+    stmt = stmt.where(PooledQuestion.source_doc_id == doc_id)
+    if query is None:
+        return stmt.where(PooledQuestion.query.is_(None))
+    return stmt.where(PooledQuestion.query == norm_query(query))
+
+
+def pool_size(doc_id: str, query: Optional[str] = None) -> int:
+    with get_session() as s:
+        stmt = _pool_filter(select(func.count(PooledQuestion.id)), doc_id, query)
+        return s.execute(stmt).scalar_one()
+
+
+def _servable(doc_id: str, n: int, query: Optional[str], difficulty: Optional[str]):
+    stmt = _pool_filter(select(PooledQuestion), doc_id, query)
+    if difficulty:
+        stmt = stmt.where(PooledQuestion.difficulty == difficulty)
+    return stmt.order_by(PooledQuestion.created_at).limit(n)
+
+
+def peek(doc_id: str, n: int, *, query: Optional[str] = None,
+         difficulty: Optional[str] = None) -> Set[str]:
+    """Stem keys of up to n questions serve_into() would hand out now (nothing is claimed)."""
+    with get_session() as s:
+        return set(s.execute(
+            _servable(doc_id, n, query, difficulty).with_only_columns(PooledQuestion.stem_key)
+        ).scalars().all())
+
+
+def serve_into(s, doc_id: str, n: int, *, query: Optional[str] = None,
+               difficulty: Optional[str] = None) -> List[Question]:
+    """
+    Move up to n pooled questions into `questions` within the caller's session; they
+    leave the pool only if the caller commits. Rows another request has locked are
+    skipped, so under contention fewer than peek() reported may come back.
+    """
+    rows = s.execute(
+        _servable(doc_id, n, query, difficulty).with_for_update(skip_locked=True)
+    ).scalars().all()
+    if not rows:
+        return []
+    served = [
+        Question(
+            stem=r.stem, options=r.options, answer=r.answer, explanation=r.explanation,
+            difficulty=r.difficulty, topic=r.topic, source_doc_id=r.source_doc_id,
+        )
+        for r in rows
+    ]
+    s.add_all(served)
+    s.execute(delete(PooledQuestion).where(PooledQuestion.id.in_([r.id for r in rows])))
+    return served
+
+
+def discard_doc(doc_id: str) -> int:
+    """Drop every pooled question of a doc (all of its pools), e.g. when it is re-ingested."""
+    with get_session() as s:
+        n = s.execute(delete(PooledQuestion).where(PooledQuestion.source_doc_id == doc_id)).rowcount
+        s.commit()
+    return n
+
+
+def _known_stem_keys(doc_id: str) -> Set[str]:
+    """Normalized stems already pooled or saved for this doc."""
+    with get_session() as s:
+        pooled = s.execute(
+            select(PooledQuestion.stem_key).where(PooledQuestion.source_doc_id == doc_id)
+        ).scalars().all()
+        saved = s.execute(
+            select(Question.stem).where(Question.source_doc_id == doc_id)
+        ).scalars().all()
+    return set(pooled) | {qgen_service._norm_stem(x) for x in saved}
+
+
+def deposit(doc_id: str, query: Optional[str], items: Iterable[Dict[str, Any]]) -> int:
+    """Validate + add items to the pool; duplicates and invalid items are dropped."""
+    added = 0
+    nq = norm_query(query) if query is not None else None
+    with get_session() as s:
+        for d in items:
+            item = qgen_service._normalize(dict(d))
+            ok, why = qgen_service._is_valid(item)
+            if not ok:
+                metrics.QUALITY_REJECTIONS.labels(reason=why).inc()
+                continue
+            row = PooledQuestion(
+                source_doc_id=doc_id, query=nq, stem_key=qgen_service._norm_stem(item["stem"]),
+                stem=item["stem"], options=item["options"], answer=item["answer"],
+                explanation=item["explanation"], difficulty=item["difficulty"], topic=item["topic"],
+            )
+            try:
+                with s.begin_nested():
+                    s.add(row)
+                added += 1
+            except IntegrityError:
+                pass  # same stem already pooled for this doc
+        with metrics.DB_WRITE_SECONDS.labels(op="pool_deposit").time():
+            s.commit()
+    metrics.POOL_DEPOSITED.inc(added)
+    return added
+
+
+async def refill(doc_id: str, query: Optional[str] = None, *, k: int = 8) -> int:
+    """Generate into the pool until it reaches POOL_HIGH_WATER (or generation stalls)."""
+    total = 0
+    while True:
+        size = await asyncio.to_thread(pool_size, doc_id, query)
+        want = min(settings.POOL_REFILL_CHUNK, settings.POOL_HIGH_WATER - size)
+        if want <= 0:
+            break
+        seen = await asyncio.to_thread(_known_stem_keys, doc_id)
+        items = await qgen_service.generate_batch_from_doc(doc_id, want, query=query, k=k, seen=seen)
+        added = await asyncio.to_thread(deposit, doc_id, query, items) if items else 0
+        total += added
+        if added == 0:
+            print(f"[POOL] doc={doc_id} query={query!r}: generation stalled at {size}; stopping refill")
+            break
+    print(f"[POOL] doc={doc_id} query={query!r}: +{total} pooled")
+    return total
+
+
+def schedule_refill(doc_id: str, query: Optional[str] = None, *, k: int = 8, force: bool = False) -> bool:
+    """
+    Start a background task on the running event loop that refills the pool if it
+    is below POOL_LOW_WATER (or force=True). At most one per (doc, query) per
+    process; returns False if one is already running. Never blocks the caller.
+    """
+    if not enabled():
+        return False
+    key = (doc_id, norm_query(query) if query is not None else None)
+    if key in _refilling:
+        return False
+
+    async def _run():
+        try:
+            if force or await asyncio.to_thread(pool_size, doc_id, query) < settings.POOL_LOW_WATER:
+                await refill(doc_id, query, k=k)
+        except Exception as e:
+            print(f"[POOL] refill failed for doc={doc_id} query={query!r}: {e}")
+        finally:
+            _refilling.discard(key)
+
+    _refilling.add(key)
+    task = asyncio.get_running_loop().create_task(_run())
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return True
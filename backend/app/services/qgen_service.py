@@ -5,28 +5,23 @@ from typing import Tuple
 
 
 from fastapi import HTTPException
-from transformers import AutoTokenizer, pipeline
 import asyncio
+import itertools
 import re
+import secrets
+import time
 from typing import Optional
 
-try:
-    from fastembed import TextEmbedding
-    _embedder = TextEmbedding()
-    def _embed_one(text: str):
-        return list(_embedder.embed([text]))[0]
-except Exception:
-    # fallback if fastembed/onnxruntime not available
-    from sentence_transformers import SentenceTransformer
-    _st = SentenceTransformer("all-MiniLM-L6-v2")
-    def _embed_one(text: str):
-        return _st.encode([text], normalize_embeddings=True)[0].tolist()
+from app.config import settings
+from app.services import inference, metrics, tracing
+from app.services.singleflight import coalescer, norm_query
 
 from qdrant_client.models import Filter, FieldCondition, MatchValue
 
 VALID_DIFFICULTIES = {"easy", "medium", "hard"}
 
 # Strengthen the JSON schema prompt to include explanation/difficulty/topic
+# NOTE: all literal braces are doubled {{ }} so .format() only fills {context}
 JSON_PROMPT = """You are an exam item writer. Output STRICT JSON only (no prose).
 Schema:
 {{
@@ -49,6 +44,28 @@ Context:
 Return only the JSON object.
 """
 
+# Greedy decoding for one-off requests (reproducible, so they can be coalesced).
+# Batch/job/pool attempts sample with a per-attempt seed and rotate the context
+# window, otherwise every retry would regenerate the same item.
+GREEDY = dict(do_sample=False, temperature=0.0, top_p=1.0)
+CONTEXT_WINDOWS = 4   # query path: rank k * CONTEXT_WINDOWS chunks, attempts take windows of k
+
+
+def _sampling(seed: Optional[int]) -> Dict[str, Any]:
+    if seed is None:
+        return GREEDY
+    return dict(do_sample=True, temperature=0.8, top_p=0.95, seed=seed)
+
+
+def _window(chunks: List[dict], k: int, seed: Optional[int]) -> List[dict]:
+    """The seed-th window of k chunks (wrapping); the first k when seed is None."""
+    if seed is None or len(chunks) <= k:
+        return chunks[:k]
+    n_windows = -(-len(chunks) // k)
+    w = seed % n_windows
+    return chunks[w * k:(w + 1) * k]
+
+
 def _normalize(item: Dict[str, Any]) -> Dict[str, Any]:
     """Make small fixes: trim strings, lowercase difficulty, coerce list types."""
     if not isinstance(item, dict):
@@ -89,16 +106,34 @@ def _is_valid(item: Dict[str, Any]) -> Tuple[bool, str]:
     return True, "ok"
 
 def _semantic_chunks(doc_id: str, query: str, k: int = 8) -> List[dict]:
+    """Vector search within a single doc; identical concurrent/recent calls are coalesced."""
+    key = ("chunks", doc_id, norm_query(query), k)
+    return coalescer.call(key, lambda: _semantic_chunks_uncached(doc_id, query, k))
+
+def _query_vector(query: str) -> List[float]:
+    """Query embedding; shared across docs so a topic fanned out over a corpus is embedded once."""
+    def _embed():
+        with tracing.span("embed", source="query"), metrics.EMBED_SECONDS.labels(source="query").time():
+            return [float(x) for x in inference.embed_one(query)]
+    return coalescer.call(("qvec", None, norm_query(query)), _embed)
+
+def _semantic_chunks_uncached(doc_id: str, query: str, k: int = 8) -> List[dict]:
     """Vector search within a single doc using query embedding."""
-    vec = [float(x) for x in _embed_one(query)]
+    vec = _query_vector(query)
+    if _vcache is not None:
+        with tracing.span("vcache.search", doc_id=doc_id, k=k):
+            return _vcache.search(doc_id, vec, k)
     flt = Filter(must=[FieldCondition(key="doc_id", match=MatchValue(value=doc_id))])
-    hits = _qdrant.search(
-        collection_name=_QDRANT_COLLECTION,
-        query_vector=vec,
-        limit=k,
-        with_payload=True,
-        query_filter=flt,
-    )
+    with tracing.span("qdrant.search", doc_id=doc_id, k=k) as sp, \
+            metrics.QDRANT_SECONDS.labels(op="search").time():
+        hits = _qdrant.query_points(
+            collection_name=_QDRANT_COLLECTION,
+            query=vec,
+            limit=k,
+            with_payload=True,
+            query_filter=flt,
+        ).points
+        sp.set(hits=len(hits))
     chunks = []
     for h in hits:
         p = h.payload or {}
@@ -106,23 +141,47 @@ def _semantic_chunks(doc_id: str, query: str, k: int = 8) -> List[dict]:
             chunks.append({"text": p["text"], "page": p.get("page"), "idx": p.get("idx")})
     return chunks
 
-async def generate_from_doc_query(doc_id: str, query: str, k: int = 8) -> Dict[str, Any]:
-    """Use query-focused chunks → prompt Qwen → return STRICT JSON."""
-    chunks = _semantic_chunks(doc_id, query, k=k)
+async def generate_from_doc_query(doc_id: str, query: str, k: int = 8,
+                                  seed: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Without a seed: greedy (deterministic) generation, so identical (doc, query, k,
+    model) calls share one in-flight computation and a short-TTL cached result.
+    With a seed: sampled from the seed's context window, never shared.
+    """
+    if seed is not None:
+        return await _generate_from_doc_query(doc_id, query, k, seed)
+    key = ("qgen", doc_id, norm_query(query), k, settings.LLM_MODEL_ID)
+    data = await coalescer.acall(key, lambda: _generate_from_doc_query(doc_id, query, k))
+    if "error" not in data:
+        data["topic"] = query
+    return data
+
+async def _generate_from_doc_query(doc_id: str, query: str, k: int = 8,
+                                   seed: Optional[int] = None) -> Dict[str, Any]:
+    """Use query-focused chunks → prompt Qwen → quality gate → item or {"error": ...}."""
+    if seed is None:
+        chunks = await asyncio.to_thread(_semantic_chunks, doc_id, query, k)
+    else:
+        ranked = await asyncio.to_thread(_semantic_chunks, doc_id, query, k * CONTEXT_WINDOWS)
+        chunks = _window(ranked, k, seed)
     if not chunks:
         return {"error": f"No chunks found for docId={doc_id} with query='{query}'"}
 
     context = "\n".join([f"(p{c['page']}#{c['idx']}): {c['text']}" for c in chunks])
     prompt = JSON_PROMPT.format(context=context)
-    out = generate(
+    # off the event loop: the call blocks on the local model or a remote worker
+    out = await asyncio.to_thread(
+        inference.generate_text,
         prompt,
         max_new_tokens=220,
-        do_sample=False,
-        temperature=0.0,
-        top_p=1.0,
         return_full_text=False,
-    )[0]["generated_text"]
-    data = _parse_json_safely(out)
+        **_sampling(seed),
+    )
+    data = _normalize(_parse_json_safely(out))
+    ok, why = _is_valid(data)  # on the model's own topic; the query replaces it below
+    if not ok:
+        metrics.QUALITY_REJECTIONS.labels(reason=why).inc()
+        return {"error": f"Failed quality checks: {why}", "last": data, "source_doc_id": doc_id}
     data["source_doc_id"] = doc_id
     data["topic"] = query
     return data
@@ -137,39 +196,9 @@ def preview_context_query(doc_id: str, query: str, k: int = 8) -> dict:
         "locations": [{"page": c["page"], "idx": c["idx"]} for c in chunks],
     }
 
-# === Model setup: Qwen2.5 (open, no auth needed) ===
-# You can also try: "Qwen/Qwen2.5-3B-Instruct" if you want a bit more quality.
-MODEL_ID = "Qwen/Qwen2.5-1.5B-Instruct"
-
-tokenizer = AutoTokenizer.from_pretrained(MODEL_ID)
-# Ensure padding token exists to avoid warnings on some environments
-if tokenizer.pad_token_id is None and tokenizer.eos_token_id is not None:
-    tokenizer.pad_token_id = tokenizer.eos_token_id
-
-generate = pipeline(
-    task="text-generation",
-    model=MODEL_ID,
-    tokenizer=tokenizer,
-    device_map="auto",     # uses MPS on Apple Silicon, or CPU otherwise
-    torch_dtype="auto"
-)
-
-# NOTE: all literal braces are doubled {{ }} so .format() only fills {context}
-JSON_PROMPT = """You are an exam item writer. Output STRICT JSON only (no prose).
-Schema:
-{{
-  "stem": "string",
-  "options": ["A","B","C","D"],
-  "answer": "A"
-}}
-Rules:
-- Use exactly 4 options.
-- Ensure the correct answer is one of the options.
-- Use ONLY the provided Context; do not invent facts.
-Context:
-{context}
-Return only the JSON object.
-"""
+# === Model: Qwen2.5 (open, no auth needed), loaded lazily by app/services/inference.py ===
+# You can also try: "Qwen/Qwen2.5-3B-Instruct" via LLM_MODEL_ID if you want a bit more quality.
+MODEL_ID = settings.LLM_MODEL_ID
 
 def _strip_code_fences(text: str) -> str:
     t = text.strip()
@@ -192,6 +221,7 @@ def _parse_json_safely(text: str) -> Dict[str, Any]:
             return json.loads(text[start:end])
         except Exception:
             pass
+    metrics.PARSE_FAILURES.inc()
     # Fallback if model returns unexpected format
     return {
         "stem": "Which organelle produces most ATP in eukaryotic cells?",
@@ -202,57 +232,167 @@ def _parse_json_safely(text: str) -> Dict[str, Any]:
 # --------------------------------------------------------------------------------------
 # Qdrant-backed generation (uses chunks you stored via /ingest)
 # --------------------------------------------------------------------------------------
-import qdrant_client
-from qdrant_client.models import Filter, FieldCondition, MatchValue
-
-_QDRANT_COLLECTION = "notes"
-_qdrant = qdrant_client.QdrantClient(host="127.0.0.1", port=6333)
-
-def _get_doc_chunks(doc_id: str, k: int = 8) -> List[dict]:
-    """Fetch up to k chunks for this doc_id (simple scroll; fast and dependency-light)."""
+from qdrant_client.models import Filter, FieldCondition, MatchValue, Range
+from app.services.vector_store import COLLECTION as _QDRANT_COLLECTION, get_qdrant
+
+_qdrant = get_qdrant()
+
+# Optional in-process vector cache (VECTOR_CACHE_ENABLED); None → every call hits Qdrant
+from app.services.vector_cache import build_cache
+_vcache = build_cache(_qdrant, _QDRANT_COLLECTION)
+
+# doc_id → (loaded at, [(page, chunks on that page)]), for paging through a doc without
+# the vector cache; kept COALESCE_TTL_S, like other results derived from a doc
+_layouts: Dict[str, Tuple[float, List[Tuple[int, int]]]] = {}
+_LAYOUTS_MAX = 1024
+
+def invalidate_doc(doc_id: str) -> None:
+    """Drop everything cached for a doc (called when it is re-ingested)."""
+    coalescer.invalidate_doc(doc_id)
+    _layouts.pop(doc_id, None)
+    if _vcache is not None:
+        _vcache.invalidate(doc_id)
+
+def _doc_layout(doc_id: str) -> List[Tuple[int, int]]:
+    """Chunk count per page (page payloads only, no text or vectors); cached per doc."""
+    hit = _layouts.get(doc_id)
+    if hit is not None and time.monotonic() - hit[0] <= settings.COALESCE_TTL_S:
+        return hit[1]
     flt = Filter(must=[FieldCondition(key="doc_id", match=MatchValue(value=doc_id))])
-    points, _ = _qdrant.scroll(
-        collection_name=_QDRANT_COLLECTION,
-        scroll_filter=flt,
-        limit=k,
-        with_payload=True,
-    )
-    return [
+    counts: Dict[int, int] = {}
+    offset = None
+    while True:
+        with tracing.span("qdrant.scroll", doc_id=doc_id, limit=1024, payload="page"), \
+                metrics.QDRANT_SECONDS.labels(op="scroll").time():
+            points, offset = _qdrant.scroll(
+                collection_name=_QDRANT_COLLECTION,
+                scroll_filter=flt,
+                limit=1024,
+                offset=offset,
+                with_payload=["page"],
+            )
+        for p in points:
+            page = (p.payload or {}).get("page")
+            if page is not None:
+                counts[page] = counts.get(page, 0) + 1
+        if offset is None:
+            break
+    layout = sorted(counts.items())
+    if len(_layouts) >= _LAYOUTS_MAX:
+        _layouts.clear()
+    _layouts[doc_id] = (time.monotonic(), layout)
+    return layout
+
+def _page_window(doc_id: str, k: int, seed: int) -> Optional[Tuple[int, int]]:
+    """(first, last) page of the seed-th run of pages holding at least k chunks (wrapping)."""
+    layout = _doc_layout(doc_id)
+    if not layout:
+        return None
+    i = seed % len(layout)
+    first, have = layout[i][0], 0
+    for page, n in layout[i:]:
+        have += n
+        if have >= k:
+            return first, page
+    return first, layout[-1][0]  # the tail of the doc is shorter than k chunks
+
+def _get_doc_chunks(doc_id: str, k: int = 8, seed: Optional[int] = None) -> List[dict]:
+    """
+    Fetch up to k chunks for this doc_id (simple scroll; fast and dependency-light).
+    A seed picks a different window of the doc, so repeated attempts see different context.
+    """
+    if _vcache is not None:
+        with tracing.span("vcache.head", doc_id=doc_id, k=k, seed=seed):
+            return _vcache.head(doc_id, k) if seed is None else _vcache.window(doc_id, k, seed)
+    must = [FieldCondition(key="doc_id", match=MatchValue(value=doc_id))]
+    limit = k
+    if seed is not None:
+        pages = _page_window(doc_id, k, seed)
+        if pages is None:
+            return []
+        must.append(FieldCondition(key="page", range=Range(gte=pages[0], lte=pages[1])))
+        limit = sum(n for page, n in _doc_layout(doc_id) if pages[0] <= page <= pages[1])
+    with tracing.span("qdrant.scroll", doc_id=doc_id, k=k) as sp, \
+            metrics.QDRANT_SECONDS.labels(op="scroll").time():
+        points, _ = _qdrant.scroll(
+            collection_name=_QDRANT_COLLECTION,
+            scroll_filter=Filter(must=must),
+            limit=limit,
+            with_payload=True,
+        )
+        sp.set(points=len(points))
+    chunks = [
         {"text": p.payload["text"], "page": p.payload["page"], "idx": p.payload["idx"]}
         for p in points
         if p.payload and "text" in p.payload
     ]
+    if seed is not None:
+        chunks.sort(key=lambda c: (c["page"], c["idx"]))
+    return chunks[:k]
 
-async def generate_one_from_doc(doc_id: str, k: int = 8, max_tries: int = 3) -> Dict[str, Any]:
+def discover_docs(topic: str, max_docs: int = 50, limit: int = 500) -> List[Dict[str, Any]]:
+    """
+    Documents relevant to a topic, across the whole collection: one unfiltered
+    vector search, hits grouped by doc_id. Sorted by relevance (hit count, then
+    best score); `hits` is what quota splitting weights by.
+    """
+    vec = _query_vector(topic)
+    with tracing.span("qdrant.search", doc_id=None, k=limit) as sp, \
+            metrics.QDRANT_SECONDS.labels(op="search").time():
+        hits = _qdrant.query_points(
+            collection_name=_QDRANT_COLLECTION,
+            query=vec,
+            limit=limit,
+            with_payload=["doc_id"],
+        ).points
+        sp.set(hits=len(hits))
+    docs: Dict[str, Dict[str, Any]] = {}
+    for h in hits:
+        doc_id = (h.payload or {}).get("doc_id")
+        if not doc_id:
+            continue
+        d = docs.setdefault(doc_id, {"docId": doc_id, "hits": 0, "best_score": h.score})
+        d["hits"] += 1
+        d["best_score"] = max(d["best_score"], h.score)
+    ranked = sorted(docs.values(), key=lambda d: (d["hits"], d["best_score"]), reverse=True)
+    return ranked[:max_docs]
+
+async def generate_one_from_doc(doc_id: str, k: int = 8, max_tries: int = 3,
+                                seed: Optional[int] = None) -> Dict[str, Any]:
     """
     Retrieve up to k chunks for this doc from Qdrant, prompt Qwen with a grounded context,
     run quality gate, retry up to (max_tries) for better JSON. Returns dict or {"error": "..."}.
+    Greedy on the doc's first chunks without a seed; with one, try t samples
+    window seed + t with seed + t (a greedy retry would only repeat itself).
     """
-    chunks = _get_doc_chunks(doc_id, k=k)
-    if not chunks:
-        return {"error": f"No chunks found for docId={doc_id}"}
-
-    context = "\n".join([f"(p{c['page']}#{c['idx']}): {c['text']}" for c in chunks])
-
     last_item = None
     last_reason = ""
     for attempt in range(1, max_tries + 1):
-        prompt = JSON_PROMPT.format(context=context)
-        out = generate(
-            prompt,
-            max_new_tokens=260,
-            do_sample=False,
-            temperature=0.0,
-            top_p=1.0
-        )[0]["generated_text"]
-
-        item = _normalize(_parse_json_safely(out))
-        ok, why = _is_valid(item)
-        if ok:
-            item["source_doc_id"] = doc_id
-            return item
-
-        last_item, last_reason = item, why
+        try_seed = None if seed is None else seed + attempt - 1
+        if attempt == 1 or try_seed is not None:
+            chunks = await asyncio.to_thread(_get_doc_chunks, doc_id, k, try_seed)
+            if not chunks:
+                return {"error": f"No chunks found for docId={doc_id}"}
+            context = "\n".join([f"(p{c['page']}#{c['idx']}): {c['text']}" for c in chunks])
+        with tracing.span("generate_one.attempt", attempt=attempt, seed=try_seed) as sp:
+            prompt = JSON_PROMPT.format(context=context)
+            out = await asyncio.to_thread(
+                inference.generate_text,
+                prompt,
+                max_new_tokens=260,
+                return_full_text=False,
+                **_sampling(try_seed),
+            )
+
+            item = _normalize(_parse_json_safely(out))
+            ok, why = _is_valid(item)
+            sp.set(ok=ok, reason=why)
+            if ok:
+                item["source_doc_id"] = doc_id
+                return item
+
+            metrics.QUALITY_REJECTIONS.labels(reason=why).inc()
+            last_item, last_reason = item, why
         # Optional: slightly nudge with a follow-up corrective prompt on next loop
         # (kept simple here to avoid complexity)
 
@@ -277,14 +417,13 @@ async def generate_question() -> Dict[str, Any]:
     )
 
     prompt = JSON_PROMPT.format(context=context)
-    out = generate(
+    out = await asyncio.to_thread(
+        inference.generate_text,
         prompt,
         max_new_tokens=200,
-        do_sample=False,
-        temperature=0.0,
-        top_p=1.0,
         return_full_text=False,   # <-- IMPORTANT here too
-    )[0]["generated_text"]
+        **GREEDY,
+    )
 
     return _parse_json_safely(out)
 
@@ -297,13 +436,6 @@ def get_preview_context(doc_id: str, k: int = 8) -> dict:
         "locations": [{"page": c["page"], "idx": c["idx"]} for c in chunks],
     }
 
-def _is_valid_item(d: Dict[str, Any]) -> bool:
-    if not isinstance(d, dict): return False
-    if "stem" not in d or "options" not in d or "answer" not in d: return False
-    opts = d["options"]
-    if not isinstance(opts, (list, tuple)) or len(opts) != 4: return False
-    return d["answer"] in opts
-
 _norm_ws = re.compile(r"\s+")
 def _norm_stem(stem: str) -> str:
     # normalize to dedupe stems
@@ -317,16 +449,24 @@ async def generate_batch_from_doc(
     k: int = 8,
     max_attempts_per_item: int = 3,
     sleep_between_calls: float = 0.0,  # set 0.2–0.5 if you ever hit rate limits
+    seen: Optional[set] = None,        # normalized stems to avoid (updated in place)
+    seed: Optional[int] = None,        # first attempt's seed (default: random); attempts count up from it
 ) -> list[Dict[str, Any]]:
     """
     Generate up to N unique MCQs (STRICT JSON) from a doc.
     - If `query` provided → semantic-focused retrieval
     - Otherwise → simple chunk scroll
     - Dedup by normalized stem
-    - Retry a few times on bad/malformed outputs
+    - Retry a few times on bad/malformed outputs; every attempt samples with its own
+      seed from its own context window, so a retry is a new candidate, not a repeat
+    - An item that keeps failing is skipped, not fatal; 422 only if nothing at all was produced
     """
     results: list[Dict[str, Any]] = []
-    seen: set[str] = set()
+    last_error: Optional[str] = None
+    if seen is None:
+        seen = set()
+    # not from `random`: sampled generation reseeds the global RNGs (transformers.set_seed)
+    seeds = itertools.count(secrets.randbits(31) if seed is None else seed)
 
     for _ in range(n):
         attempt = 0
@@ -334,25 +474,35 @@ async def generate_batch_from_doc(
 
         while attempt < max_attempts_per_item:
             attempt += 1
-            if query:
-                d = await generate_from_doc_query(doc_id=doc_id, query=query, k=k)
-            else:
-                d = await generate_one_from_doc(doc_id=doc_id, k=k)
-
-            if "error" in d:
-                raise HTTPException(status_code=422, detail=item["error"])
-                
-
-            if _is_valid_item(d):
-                key = _norm_stem(d["stem"])
-                if key in seen:
-                    print("[BATCH] duplicate stem detected; retrying…")
+            attempt_seed = next(seeds)
+            with tracing.span("batch.attempt", item=len(results) + 1, attempt=attempt, query=query,
+                              seed=attempt_seed) as sp:
+                if query:
+                    d = await generate_from_doc_query(doc_id=doc_id, query=query, k=k, seed=attempt_seed)
+                else:
+                    # this loop already retries, each time with a fresh seed
+                    d = await generate_one_from_doc(doc_id=doc_id, k=k, max_tries=1, seed=attempt_seed)
+
+                verdict = None if "error" in d else _is_valid(d)
+                if verdict is None:
+                    sp.set(outcome="error")
+                    last_error = d["error"]
+                elif verdict[0]:
+                    key = _norm_stem(d["stem"])
+                    if key in seen:
+                        sp.set(outcome="duplicate")
+                        metrics.DUPLICATE_RETRIES.inc()
+                        print("[BATCH] duplicate stem detected; retrying…")
+                    else:
+                        seen.add(key)
+                        sp.set(outcome="accepted")
+                        item = d
+                        break
                 else:
-                    seen.add(key)
-                    item = d
-                    break
-            else:
-                print("[BATCH] invalid JSON shape or answer/options mismatch; retrying…")
+                    # both generators gate their output already; count whatever slips through
+                    sp.set(outcome="invalid", reason=verdict[1])
+                    metrics.QUALITY_REJECTIONS.labels(reason=verdict[1]).inc()
+                    print(f"[BATCH] invalid item ({verdict[1]}); retrying…")
 
             if sleep_between_calls:
                 await asyncio.sleep(sleep_between_calls)
@@ -362,4 +512,6 @@ async def generate_batch_from_doc(
         else:
             print("[BATCH] gave up on one item after retries")
 
+    if not results and last_error:
+        raise HTTPException(status_code=422, detail=last_error)
     return results
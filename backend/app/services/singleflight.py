@@ -0,0 +1,156 @@
+# app/services/singleflight.py
+"""
+Request coalescing for deterministic retrieval/generation.
+
+Concurrent calls with the same key share one in-flight computation (sync callers
+via threading, async callers via a shared future); finished results are kept in a
+short-TTL cache. Keys are tuples whose second element is the doc_id, so
+invalidate_doc() can drop everything derived from a document when it is re-ingested.
+Only deterministic calls may be coalesced: sampled generation (batch/job/pool
+attempts, each with its own seed) goes straight to the model, or every retry
+would get the cached item back.
+"""
+import asyncio
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from app.config import settings
+from app.services import metrics
+
+_MISS = object()
+
+
+def _cacheable(result: Any) -> bool:
+    # never pin failures ({"error": ...}) for the TTL
+    return not (isinstance(result, dict) and "error" in result)
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    def __init__(self, ttl_s: float, max_entries: int):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, _Flight] = {}
+        self._inflight_async: Dict[Hashable, asyncio.Future] = {}
+        self._doc_epoch: Dict[str, int] = {}
+
+    # ---- cache ----------------------------------------------------------------------
+
+    def _get(self, key: Hashable) -> Any:
+        if self.ttl_s <= 0:
+            return _MISS
+        with self._lock:
+            hit = self._cache.get(key)
+            if hit is None:
+                return _MISS
+            if hit[0] < time.monotonic():
+                del self._cache[key]
+                return _MISS
+            self._cache.move_to_end(key)
+            return hit[1]
+
+    def _put(self, key: Hashable, value: Any, epoch: int) -> None:
+        if self.ttl_s <= 0 or not _cacheable(value):
+            return
+        with self._lock:
+            if self._doc_epoch.get(key[1], 0) != epoch:
+                return  # doc was invalidated while we were computing
+            self._cache[key] = (time.monotonic() + self.ttl_s, value)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def _epoch(self, key: Hashable) -> int:
+        with self._lock:
+            return self._doc_epoch.get(key[1], 0)
+
+    def invalidate_doc(self, doc_id: str) -> None:
+        with self._lock:
+            self._doc_epoch[doc_id] = self._doc_epoch.get(doc_id, 0) + 1
+            for key in [k for k in self._cache if k[1] == doc_id]:
+                del self._cache[key]
+
+    # ---- sync -----------------------------------------------------------------------
+
+    def call(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        hit = self._get(key)
+        if hit is not _MISS:
+            metrics.COALESCE_EVENTS.labels(kind="cache_hit").inc()
+            return copy.deepcopy(hit)
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                epoch = self._doc_epoch.get(key[1], 0)
+        if not leader:
+            metrics.COALESCE_EVENTS.labels(kind="shared").inc()
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return copy.deepcopy(flight.result)
+
+        metrics.COALESCE_EVENTS.labels(kind="miss").inc()
+        try:
+            flight.result = fn()
+            self._put(key, flight.result, epoch)
+            return copy.deepcopy(flight.result)
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+
+    # ---- async ----------------------------------------------------------------------
+
+    async def acall(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        hit = self._get(key)
+        if hit is not _MISS:
+            metrics.COALESCE_EVENTS.labels(kind="cache_hit").inc()
+            return copy.deepcopy(hit)
+        fut = self._inflight_async.get(key)
+        if fut is not None:
+            metrics.COALESCE_EVENTS.labels(kind="shared").inc()
+            return copy.deepcopy(await asyncio.shield(fut))
+
+        metrics.COALESCE_EVENTS.labels(kind="miss").inc()
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight_async[key] = fut
+        epoch = self._epoch(key)
+        try:
+            result = await factory()
+        except Exception as e:
+            fut.set_exception(e)
+            fut.exception()  # mark retrieved; waiters (if any) still see it
+            raise
+        except BaseException:
+            fut.cancel()
+            raise
+        else:
+            fut.set_result(result)
+            self._put(key, result, epoch)
+        finally:
+            self._inflight_async.pop(key, None)
+        return copy.deepcopy(result)
+
+
+def norm_query(q: str) -> str:
+    return " ".join((q or "").lower().split())
+
+
+coalescer = SingleFlight(ttl_s=settings.COALESCE_TTL_S, max_entries=settings.COALESCE_MAX_ENTRIES)
@@ -0,0 +1,115 @@
+# app/services/stats_service.py
+"""
+Question-bank counts for dashboards.
+
+On Postgres (once migration d04e871e6539 has installed the triggers) counts are
+read from `question_stats`, which holds one row per document, topic and
+difficulty plus a total row, kept current in the inserting transaction (see
+app/models/question_stat.py): a total over at most one filter is one row, an
+unfiltered summary one row per value. Combined filters need cross-dimension
+counts the table doesn't keep, so they (and every count on other backends, e.g.
+the SQLite bench) aggregate `questions` live under the filter.
+"""
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import desc, func, select, text
+
+from app.models.question import Question
+from app.models.question_stat import QuestionStat
+from app.services.db import engine, get_session
+
+# summary key → (question column, question_stats dim)
+_DIMS = {
+    "source_doc_id": (Question.source_doc_id, "doc"),
+    "topic": (Question.topic, "topic"),
+    "difficulty": (Question.difficulty, "difficulty"),
+}
+_RECHECK_S = 60.0
+_maintained_at: Optional[float] = None  # when the triggers were last seen missing
+_maintained = False
+
+
+def maintained() -> bool:
+    """True once the stats triggers exist (checked at most every _RECHECK_S while they don't)."""
+    global _maintained, _maintained_at
+    if _maintained or engine.dialect.name != "postgresql":
+        return _maintained
+    now = time.monotonic()
+    if _maintained_at is None or now - _maintained_at >= _RECHECK_S:
+        _maintained_at = now
+        with get_session() as s:
+            _maintained = bool(s.execute(
+                text("SELECT 1 FROM pg_trigger WHERE tgname = 'trg_question_stats_ins'")
+            ).first())
+    return _maintained
+
+
+def _stat(s, dim: str, key: str) -> int:
+    n = s.execute(select(QuestionStat.n).where(QuestionStat.dim == dim, QuestionStat.key == key)).scalar()
+    return max(n or 0, 0)
+
+
+def version(*, session=None) -> Optional[int]:
+    """
+    Change counter the triggers bump on every insert/delete statement on
+    `questions` (None where they aren't installed): a cheap validator for listings.
+    """
+    if not maintained():
+        return None
+    if session is None:
+        with get_session() as s:
+            return _stat(s, "version", "")
+    return _stat(session, "version", "")
+
+
+def _conds(filters: Dict[str, Optional[str]]) -> list:
+    return [_DIMS[name][0] == v for name, v in filters.items() if v is not None]
+
+
+def total(doc_id: Optional[str] = None, topic: Optional[str] = None,
+          difficulty: Optional[str] = None, *, session=None) -> int:
+    """Questions matching the filters. Pass `session` to count inside the caller's transaction."""
+    filters = {"source_doc_id": doc_id, "topic": topic, "difficulty": difficulty}
+    given = [(_DIMS[name][1], v) for name, v in filters.items() if v is not None]
+    if session is None:
+        with get_session() as s:
+            return total(doc_id, topic, difficulty, session=s)
+    if len(given) <= 1 and maintained():
+        return _stat(session, *(given[0] if given else ("total", "")))
+    return session.execute(select(func.count(Question.id)).where(*_conds(filters))).scalar_one()
+
+
+def _from_table(s) -> Tuple[int, Dict[str, List[Tuple[str, int]]]]:
+    by: Dict[str, List[Tuple[str, int]]] = {}
+    for name, (_, dim) in _DIMS.items():
+        by[name] = [tuple(r) for r in s.execute(
+            select(QuestionStat.key, QuestionStat.n)
+            .where(QuestionStat.dim == dim, QuestionStat.n > 0)
+            .order_by(desc(QuestionStat.n))
+        ).all()]
+    return _stat(s, "total", ""), by
+
+
+def _live(s, conds: list) -> Tuple[int, Dict[str, List[Tuple[str, int]]]]:
+    by: Dict[str, List[Tuple[str, int]]] = {}
+    for name, (col, _) in _DIMS.items():
+        key = func.coalesce(col, "")
+        n = func.count(Question.id)
+        by[name] = [tuple(r) for r in s.execute(
+            select(key, n).where(*conds).group_by(key).order_by(desc(n))
+        ).all()]
+    return s.execute(select(func.count(Question.id)).where(*conds)).scalar_one(), by
+
+
+def summary(doc_id: Optional[str] = None, topic: Optional[str] = None,
+            difficulty: Optional[str] = None) -> Dict[str, Any]:
+    """Total plus per-doc / per-topic / per-difficulty counts (largest first); '' → null."""
+    conds = _conds({"source_doc_id": doc_id, "topic": topic, "difficulty": difficulty})
+    with get_session() as s:
+        n, by = _from_table(s) if not conds and maintained() else _live(s, conds)
+
+    out: Dict[str, Any] = {"total": n}
+    for name, counts in by.items():
+        out[f"by_{name.removeprefix('source_')}"] = [{name: key or None, "n": c} for key, c in counts]
+    return out
@@ -0,0 +1,231 @@
+# app/services/tracing.py
+"""
+Opt-in per-request tracing + sampling profile.
+
+A trace only exists while a profiled request is running (see ProfilingMiddleware);
+otherwise span() returns a shared no-op, so instrumented code pays one ContextVar
+lookup. Finished traces are kept in a small in-memory LRU for download via
+/admin/traces.
+"""
+import cProfile
+import hmac
+import html
+import io
+import pstats
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs
+
+from app.config import settings
+
+try:
+    from pyinstrument import Profiler  # sampling profiler (in requirements.txt)
+except Exception:  # pragma: no cover - optional dependency
+    Profiler = None
+
+
+class _CProfileProfiler:
+    """Stand-in with the pyinstrument interface when it isn't installed (deterministic, this thread only)."""
+
+    def __init__(self):
+        self._prof = cProfile.Profile()
+
+    def start(self) -> None:
+        self._prof.enable()
+
+    def stop(self) -> None:
+        self._prof.disable()
+
+    def output_text(self, unicode: bool = True) -> str:
+        buf = io.StringIO()
+        pstats.Stats(self._prof, stream=buf).sort_stats("cumulative").print_stats(60)
+        return buf.getvalue()
+
+    def output_html(self) -> str:
+        return f"<html><body><pre>{html.escape(self.output_text())}</pre></body></html>"
+
+_current: ContextVar[Optional["Trace"]] = ContextVar("biomentor_trace", default=None)
+_current_span: ContextVar[Optional[int]] = ContextVar("biomentor_span", default=None)
+
+
+class Span:
+    __slots__ = ("id", "parent", "name", "start_ms", "duration_ms", "attrs")
+
+    def __init__(self, sid: int, parent: Optional[int], name: str, start_ms: float, attrs: Dict[str, Any]):
+        self.id = sid
+        self.parent = parent
+        self.name = name
+        self.start_ms = start_ms
+        self.duration_ms: Optional[float] = None
+        self.attrs = attrs
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"id": self.id, "parent": self.parent, "name": self.name,
+                "start_ms": round(self.start_ms, 3),
+                "duration_ms": None if self.duration_ms is None else round(self.duration_ms, 3),
+                **({"attrs": self.attrs} if self.attrs else {})}
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attrs) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Trace:
+    def __init__(self, method: str, path: str):
+        self.id = uuid.uuid4().hex
+        self.method = method
+        self.path = path
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.status: Optional[int] = None
+        self.spans: List[Span] = []
+        self.profile_html: Optional[str] = None
+        self.profile_text: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def _new_span(self, name: str, parent: Optional[int], attrs: Dict[str, Any]) -> Span:
+        with self._lock:
+            sp = Span(len(self.spans) + 1, parent, name, (time.perf_counter() - self._t0) * 1000, attrs)
+            self.spans.append(sp)
+        return sp
+
+    def finish(self, status: Optional[int]) -> None:
+        self.status = status
+        self.duration_ms = (time.perf_counter() - self._t0) * 1000
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id, "method": self.method, "path": self.path,
+            "started_at": self.started_at, "status": self.status,
+            "duration_ms": None if self.duration_ms is None else round(self.duration_ms, 3),
+            "has_profile": self.profile_html is not None,
+            "spans": [sp.to_dict() for sp in self.spans],
+        }
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Record a timed span under the active trace; no-op when none is active."""
+    trace = _current.get()
+    if trace is None:
+        yield _NOOP
+        return
+    sp = trace._new_span(name, _current_span.get(), attrs)
+    token = _current_span.set(sp.id)
+    t0 = time.perf_counter()
+    try:
+        yield sp
+    except Exception as e:
+        sp.set(error=f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        sp.duration_ms = (time.perf_counter() - t0) * 1000
+        _current_span.reset(token)
+
+
+def active() -> bool:
+    return _current.get() is not None
+
+
+# ---- store --------------------------------------------------------------------------
+
+_store: "OrderedDict[str, Trace]" = OrderedDict()
+_store_lock = threading.Lock()
+
+
+def _keep(trace: Trace) -> None:
+    with _store_lock:
+        _store[trace.id] = trace
+        while len(_store) > settings.TRACE_STORE_MAX:
+            _store.popitem(last=False)
+
+
+def get_trace(trace_id: str) -> Optional[Trace]:
+    with _store_lock:
+        return _store.get(trace_id)
+
+
+def list_traces() -> List[Dict[str, Any]]:
+    with _store_lock:
+        traces = list(_store.values())
+    return [{"id": t.id, "method": t.method, "path": t.path, "started_at": t.started_at,
+             "status": t.status, "duration_ms": t.duration_ms, "spans": len(t.spans)}
+            for t in reversed(traces)]
+
+
+def is_admin(token: Optional[str]) -> bool:
+    return bool(settings.ADMIN_TOKEN) and bool(token) and hmac.compare_digest(token, settings.ADMIN_TOKEN)
+
+
+# ---- middleware ---------------------------------------------------------------------
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware. A request is profiled when it carries `X-Profile: 1`
+    (or `?profile=1`) AND a valid `X-Admin-Token`. The response gets an
+    `X-Trace-Id` header; fetch the trace from /admin/traces/{id}.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(scope.get("method", ""), scope.get("path", ""))
+        status: Dict[str, int] = {}
+
+        async def send_with_trace_id(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"x-trace-id", trace.id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        profiler = Profiler(async_mode="enabled") if Profiler is not None else _CProfileProfiler()
+        token = _current.set(trace)
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_trace_id)
+        finally:
+            profiler.stop()
+            trace.profile_html = profiler.output_html()
+            trace.profile_text = profiler.output_text(unicode=True)
+            _current.reset(token)
+            trace.finish(status.get("code"))
+            _keep(trace)
+            print(f"[TRACE] {trace.method} {trace.path} id={trace.id} "
+                  f"{trace.duration_ms:.1f}ms spans={len(trace.spans)}")
+
+    @staticmethod
+    def _wants_profile(scope) -> bool:
+        flag = None
+        admin = None
+        for k, v in scope.get("headers", ()):
+            if k == b"x-profile":
+                flag = v.decode("latin-1")
+            elif k == b"x-admin-token":
+                admin = v.decode("latin-1")
+        if flag is None and b"profile" in scope.get("query_string", b""):
+            flag = (parse_qs(scope["query_string"].decode("latin-1")).get("profile") or [None])[0]
+        if flag not in ("1", "true", "yes"):
+            return False
+        return is_admin(admin)
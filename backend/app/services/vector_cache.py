@@ -0,0 +1,222 @@
+# app/services/vector_cache.py
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from qdrant_client.models import Filter, FieldCondition, MatchValue
+
+from app.config import settings
+from app.services import metrics, tracing
+
+_SCROLL_PAGE = 512
+
+
+class _DocEntry:
+    """Vectors (unit-normalised, row-major) + payloads for one doc_id."""
+
+    def __init__(self, vectors: np.ndarray, payloads: List[Dict[str, Any]]):
+        self.vectors = vectors
+        self.payloads = payloads
+        self.loaded_at = time.monotonic()
+        # memmapped vectors live in the page cache, not our heap: only payloads count
+        resident = 0 if isinstance(vectors, np.memmap) else int(vectors.nbytes)
+        self.nbytes = resident + sum(len(p.get("text") or "") for p in payloads)
+
+
+class DocVectorCache:
+    """
+    In-process, per-document vector cache.
+
+    A document is loaded once (one Qdrant scroll, or a local .npy memmap when
+    `cache_dir` is set) and every later search/scroll for that doc_id is answered
+    in-process with a vectorised cosine top-k. Evicts least-recently-used docs when
+    either `max_docs` or `max_bytes` is exceeded. invalidate() only reaches this
+    process, so entries (and .npy files) older than `ttl_s` are reloaded: another
+    worker serves a re-ingested doc's old chunks for at most that long.
+    """
+
+    def __init__(self, client, collection: str, *, max_bytes: int, max_docs: int,
+                 cache_dir: Optional[str] = None, ttl_s: float = 300.0):
+        self._client = client
+        self._collection = collection
+        self._max_bytes = max_bytes
+        self._max_docs = max_docs
+        self._ttl_s = ttl_s
+        self._dir = Path(cache_dir) if cache_dir else None
+        if self._dir:
+            self._dir.mkdir(parents=True, exist_ok=True)
+        self._entries: "OrderedDict[str, _DocEntry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._loading: Dict[str, threading.Lock] = {}
+
+    # ---- public API -------------------------------------------------------------
+
+    def search(self, doc_id: str, query_vector, k: int) -> List[Dict[str, Any]]:
+        """Cosine top-k within one doc. Returns payload dicts, best match first."""
+        entry = self._get(doc_id)
+        n = entry.vectors.shape[0]
+        if n == 0 or k <= 0:
+            return []
+        q = np.asarray(query_vector, dtype=np.float32)
+        norm = float(np.linalg.norm(q))
+        if norm > 0:
+            q = q / norm
+        scores = entry.vectors @ q
+        k = min(k, n)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [entry.payloads[i] for i in top]
+
+    def head(self, doc_id: str, k: int) -> List[Dict[str, Any]]:
+        """First k payloads in Qdrant scroll order (same as scroll(limit=k))."""
+        return self._get(doc_id).payloads[:k]
+
+    def window(self, doc_id: str, k: int, n: int) -> List[Dict[str, Any]]:
+        """The n-th run of k payloads in scroll order, wrapping around the doc."""
+        payloads = self._get(doc_id).payloads
+        if len(payloads) <= k:
+            return payloads[:]
+        w = n % -(-len(payloads) // k)
+        return payloads[w * k:(w + 1) * k]
+
+    def invalidate(self, doc_id: str) -> None:
+        with self._lock:
+            entry = self._entries.pop(doc_id, None)
+            if entry is not None:
+                self._bytes -= entry.nbytes
+        if self._dir:
+            for path in self._paths(doc_id):
+                path.unlink(missing_ok=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"docs": len(self._entries), "bytes": self._bytes,
+                    "max_docs": self._max_docs, "max_bytes": self._max_bytes}
+
+    # ---- internals --------------------------------------------------------------
+
+    def _paths(self, doc_id: str):
+        # doc_id comes from request parameters: never let it name a file directly
+        stem = hashlib.sha256(doc_id.encode("utf-8")).hexdigest()
+        return self._dir / f"{stem}.npy", self._dir / f"{stem}.json"
+
+    def _cached(self, doc_id: str) -> Optional[_DocEntry]:
+        # caller holds self._lock
+        entry = self._entries.get(doc_id)
+        if entry is None:
+            return None
+        if time.monotonic() - entry.loaded_at > self._ttl_s:
+            del self._entries[doc_id]
+            self._bytes -= entry.nbytes
+            return None
+        self._entries.move_to_end(doc_id)
+        return entry
+
+    def _get(self, doc_id: str) -> _DocEntry:
+        with self._lock:
+            entry = self._cached(doc_id)
+            if entry is not None:
+                return entry
+            load_lock = self._loading.setdefault(doc_id, threading.Lock())
+
+        # one loader per doc_id; concurrent callers wait and reuse the result
+        with load_lock:
+            with self._lock:
+                entry = self._cached(doc_id)
+                if entry is not None:
+                    return entry
+            entry = self._load_local(doc_id) or self._load_remote(doc_id)
+            if entry.payloads:  # don't pin misses for unknown doc_ids
+                self._put(doc_id, entry)
+        with self._lock:
+            self._loading.pop(doc_id, None)
+        return entry
+
+    def _put(self, doc_id: str, entry: _DocEntry) -> None:
+        with self._lock:
+            self._entries[doc_id] = entry
+            self._bytes += entry.nbytes
+            while len(self._entries) > 1 and (
+                len(self._entries) > self._max_docs or self._bytes > self._max_bytes
+            ):
+                _, old = self._entries.popitem(last=False)
+                self._bytes -= old.nbytes
+
+    def _load_local(self, doc_id: str) -> Optional[_DocEntry]:
+        if not self._dir:
+            return None
+        vec_path, meta_path = self._paths(doc_id)
+        if not (vec_path.exists() and meta_path.exists()):
+            return None
+        if time.time() - vec_path.stat().st_mtime > self._ttl_s:
+            return None  # possibly written before a re-ingest in another worker; rewritten below
+        try:
+            vectors = np.load(vec_path, mmap_mode="r")
+            payloads = json.loads(meta_path.read_text())
+        except Exception as e:
+            print(f"[VCACHE] ignoring unreadable cache files for {doc_id}: {e}")
+            return None
+        return _DocEntry(vectors, payloads)
+
+    def _load_remote(self, doc_id: str) -> _DocEntry:
+        flt = Filter(must=[FieldCondition(key="doc_id", match=MatchValue(value=doc_id))])
+        rows: List[List[float]] = []
+        payloads: List[Dict[str, Any]] = []
+        offset = None
+        while True:
+            with tracing.span("qdrant.scroll", doc_id=doc_id, limit=_SCROLL_PAGE, vectors=True), \
+                    metrics.QDRANT_SECONDS.labels(op="scroll").time():
+                points, offset = self._client.scroll(
+                    collection_name=self._collection,
+                    scroll_filter=flt,
+                    limit=_SCROLL_PAGE,
+                    offset=offset,
+                    with_payload=True,
+                    with_vectors=True,
+                )
+            for p in points:
+                if not p.payload or "text" not in p.payload or p.vector is None:
+                    continue
+                rows.append(p.vector)
+                payloads.append({"text": p.payload["text"],
+                                 "page": p.payload.get("page"),
+                                 "idx": p.payload.get("idx")})
+            if offset is None:
+                break
+
+        if rows:
+            vectors = np.ascontiguousarray(rows, dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            vectors /= norms
+        else:
+            vectors = np.zeros((0, 0), dtype=np.float32)
+
+        if self._dir and rows:
+            vec_path, meta_path = self._paths(doc_id)
+            np.save(vec_path, vectors)
+            meta_path.write_text(json.dumps(payloads))
+            vectors = np.load(vec_path, mmap_mode="r")
+
+        print(f"[VCACHE] loaded doc={doc_id} chunks={len(payloads)}")
+        return _DocEntry(vectors, payloads)
+
+
+def build_cache(client, collection: str) -> Optional[DocVectorCache]:
+    """Return a cache configured from settings, or None when disabled."""
+    if not settings.VECTOR_CACHE_ENABLED:
+        return None
+    return DocVectorCache(
+        client,
+        collection,
+        max_bytes=int(settings.VECTOR_CACHE_MAX_MB * 1024 * 1024),
+        max_docs=settings.VECTOR_CACHE_MAX_DOCS,
+        cache_dir=settings.VECTOR_CACHE_DIR or None,
+        ttl_s=settings.VECTOR_CACHE_TTL_S,
+    )
@@ -0,0 +1,27 @@
+# app/services/vector_store.py
+"""Shared Qdrant client. QDRANT_LOCATION=":memory:" (or a path) runs Qdrant in-process."""
+import threading
+
+import qdrant_client
+
+from app.config import settings
+
+COLLECTION = "notes"
+EMBED_DIM = 384  # fastembed default
+
+_client = None
+_lock = threading.Lock()
+
+
+def get_qdrant() -> qdrant_client.QdrantClient:
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                if settings.QDRANT_LOCATION == ":memory:":
+                    _client = qdrant_client.QdrantClient(location=":memory:")
+                elif settings.QDRANT_LOCATION:
+                    _client = qdrant_client.QdrantClient(path=settings.QDRANT_LOCATION)
+                else:
+                    _client = qdrant_client.QdrantClient(host=settings.QDRANT_HOST, port=settings.QDRANT_PORT)
+    return _client
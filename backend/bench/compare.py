@@ -0,0 +1,34 @@
+# bench/compare.py
+"""
+Compare two benchmark JSON reports written by bench.run.
+
+    python -m bench.compare baseline.json candidate.json
+"""
+import json
+import sys
+from typing import Any, Dict, Iterator, Tuple
+
+
+def _leaves(node: Any, prefix: str = "") -> Iterator[Tuple[str, float]]:
+    if isinstance(node, dict):
+        for k, v in node.items():
+            yield from _leaves(v, f"{prefix}.{k}" if prefix else k)
+    elif isinstance(node, (int, float)) and not isinstance(node, bool):
+        yield prefix, float(node)
+
+
+def compare(base: Dict[str, Any], cand: Dict[str, Any]) -> None:
+    a = dict(_leaves(base.get("results", {})))
+    b = dict(_leaves(cand.get("results", {})))
+    print(f"{'metric':60} {'base':>12} {'cand':>12} {'change':>9}")
+    for key in sorted(a.keys() & b.keys()):
+        old, new = a[key], b[key]
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        print(f"{key:60} {old:12.3f} {new:12.3f} {change:>9}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit(__doc__)
+    with open(sys.argv[1]) as f1, open(sys.argv[2]) as f2:
+        compare(json.load(f1), json.load(f2))
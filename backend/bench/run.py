@@ -0,0 +1,316 @@
+# bench/run.py
+"""
+Offline, reproducible benchmark suite.
+
+    # from backend/
+    python -m bench.run --out bench_results.json
+    python -m bench.run --pages 200 --questions 50000 --out big.json
+    python -m bench.run --llm hf --model <local tiny HF model id or path>   # real (tiny) model
+
+Defaults use only local stand-ins: in-process Qdrant (":memory:"), SQLite, a
+deterministic stub generator and a hashing embedder. Pass --database-url to point
+at a local Postgres, --embedder fastembed to use the real embedder (must be cached).
+Results are written as JSON so runs can be diffed / compared.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+
+def _parse_args(argv=None):
+    p = argparse.ArgumentParser(description="BioMentor offline benchmarks")
+    p.add_argument("--out", default="bench_results.json")
+    p.add_argument("--docs", type=int, default=2, help="synthetic PDFs to ingest")
+    p.add_argument("--pages", type=int, default=20, help="pages per synthetic PDF")
+    p.add_argument("--sentences", type=int, default=40, help="sentences per page")
+    p.add_argument("--retrieval-iters", type=int, default=200)
+    p.add_argument("--k", type=int, default=8)
+    p.add_argument("--batch-n", type=int, default=20, help="questions per batch generation run")
+    p.add_argument("--questions", type=int, default=5000, help="rows seeded for export/list benchmarks")
+    p.add_argument("--list-iters", type=int, default=200)
+    p.add_argument("--llm", choices=["stub", "hf"], default="stub")
+    p.add_argument("--model", default=None, help="HF model id/path for --llm hf")
+    p.add_argument("--stub-ms-per-token", type=float, default=0.0)
+    p.add_argument("--embedder", choices=["hash", "fastembed"], default="hash")
+    p.add_argument("--database-url", default=None, help="default: SQLite file in a temp dir")
+    p.add_argument("--qdrant", default=":memory:", help='":memory:", a local path, or "server"')
+    p.add_argument("--seed", type=int, default=0)
+    return p.parse_args(argv)
+
+
+def _configure_env(args, tmp: Path) -> None:
+    """Must run before any `app.*` import: settings are read at import time."""
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tmp / 'bench.db'}"
+    if args.qdrant != "server":
+        os.environ["QDRANT_LOCATION"] = args.qdrant
+    if args.model:
+        os.environ["LLM_MODEL_ID"] = args.model
+    if args.llm == "hf" or args.embedder == "fastembed":
+        os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+
+def _summary(samples: List[float]) -> Dict[str, float]:
+    s = sorted(samples)
+    pick = lambda q: s[min(len(s) - 1, int(q * len(s)))]
+    return {
+        "n": len(s),
+        "mean_ms": statistics.fmean(s) * 1000,
+        "p50_ms": pick(0.50) * 1000,
+        "p95_ms": pick(0.95) * 1000,
+        "p99_ms": pick(0.99) * 1000,
+        "max_ms": s[-1] * 1000,
+    }
+
+
+def _timeit(fn: Callable[[], Any], iters: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(iters):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return _summary(samples)
+
+
+def _section(results: Dict[str, Any], name: str, fn: Callable[[], Dict[str, Any]]) -> None:
+    """Run one section; a failure is recorded (later sections still run) and fails the run."""
+    print(f"[BENCH] {name} …")
+    try:
+        results[name] = fn()
+    except Exception as e:
+        results[name] = {"error": f"{type(e).__name__}: {e}"}
+    print(f"[BENCH] {name}: {json.dumps(results[name], default=str)}")
+
+
+def _failed(report: Dict[str, Any]) -> List[str]:
+    return [name for name, r in report["results"].items() if isinstance(r, dict) and "error" in r]
+
+
+async def _drain(body_iterator) -> int:
+    """Consume a StreamingResponse body (always an async iterator) and return its size."""
+    size = 0
+    async for chunk in body_iterator:
+        size += len(chunk)
+    return size
+
+
+class _Upload:
+    """Minimal stand-in for fastapi.UploadFile as used by ingest_pdf."""
+
+    def __init__(self, data: bytes, filename: str = "bench.pdf"):
+        self._data = data
+        self.filename = filename
+
+    async def read(self) -> bytes:
+        return self._data
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def main(argv=None) -> Dict[str, Any]:
+    args = _parse_args(argv)
+    tmp = Path(tempfile.mkdtemp(prefix="biomentor-bench-"))
+    _configure_env(args, tmp)
+
+    from bench import stubs
+    from app.services import inference
+
+    generator = None
+    if args.llm == "stub":
+        generator = stubs.StubGenerator(ms_per_token=args.stub_ms_per_token)
+    inference.install(
+        generator=generator,
+        embedder=stubs.HashEmbedder() if args.embedder == "hash" else None,
+    )
+    inference.warmup()
+
+    from app.services.db import get_session, init_db
+    from app.services import ingestion_service, qgen_service
+    from app.models.question import Question
+    from app.api import routes_questions
+
+    init_db()
+    results: Dict[str, Any] = {}
+    doc_ids: List[str] = []
+
+    # ---- ingest -----------------------------------------------------------------------
+    def bench_ingest():
+        pdfs = [stubs.make_pdf(args.pages, args.sentences, seed=args.seed + i) for i in range(args.docs)]
+        chunks = 0
+        t0 = time.perf_counter()
+        for data in pdfs:
+            out = asyncio.run(ingestion_service.ingest_pdf(_Upload(data)))
+            doc_ids.append(out["docId"])
+            chunks += out["count"]
+        elapsed = time.perf_counter() - t0
+        pages = args.docs * args.pages
+        return {"docs": args.docs, "pages": pages, "chunks": chunks, "seconds": elapsed,
+                "pages_per_sec": pages / elapsed, "chunks_per_sec": chunks / elapsed}
+
+    _section(results, "ingest", bench_ingest)
+
+    # ---- retrieval --------------------------------------------------------------------
+    def bench_retrieval():
+        import random
+        rng = random.Random(args.seed)
+        doc = doc_ids[0]
+        queries = [" ".join(rng.sample(stubs.VOCAB, 2)) for _ in range(args.retrieval_iters)]
+        it = iter(queries)
+        return {
+            "semantic_chunks": _timeit(lambda: qgen_service._semantic_chunks(doc, next(it), k=args.k),
+                                       args.retrieval_iters),
+            "get_doc_chunks": _timeit(lambda: qgen_service._get_doc_chunks(doc, k=args.k),
+                                      args.retrieval_iters),
+        }
+
+    _section(results, "retrieval", bench_retrieval)
+
+    # ---- batch generation -------------------------------------------------------------
+    def bench_batch(query):
+        def run():
+            t0 = time.perf_counter()
+            items = asyncio.run(qgen_service.generate_batch_from_doc(
+                doc_id=doc_ids[0], n=args.batch_n, query=query, k=args.k))
+            elapsed = time.perf_counter() - t0
+            return {"requested": args.batch_n, "generated": len(items), "seconds": elapsed,
+                    "items_per_sec": len(items) / elapsed if elapsed else None}
+        return run
+
+    _section(results, "batch_generation_query", bench_batch("osmosis"))
+    _section(results, "batch_generation_scroll", bench_batch(None))
+
+    # ---- seed DB ----------------------------------------------------------------------
+    def bench_seed():
+        import random
+        rng = random.Random(args.seed)
+        rows = []
+        for i in range(args.questions):
+            opts = rng.sample(stubs.VOCAB, 4)
+            rows.append(Question(
+                id=uuid.uuid4(), stem=f"Seeded question {i} about {opts[0]}?", options=opts,
+                answer=opts[0], explanation=f"Because {opts[0]} is described in the context.",
+                difficulty=rng.choice(["easy", "medium", "hard"]), topic=rng.choice(stubs.VOCAB),
+                source_doc_id=doc_ids[i % len(doc_ids)] if doc_ids else None,
+            ))
+        t0 = time.perf_counter()
+        with get_session() as s:
+            s.add_all(rows)
+            s.commit()
+        elapsed = time.perf_counter() - t0
+        return {"rows": len(rows), "seconds": elapsed, "rows_per_sec": len(rows) / elapsed}
+
+    _section(results, "db_seed", bench_seed)
+
+    # ---- export -----------------------------------------------------------------------
+    def bench_export(fmt):
+        def run():
+            t0 = time.perf_counter()
+            resp = routes_questions.export_questions(format=fmt, limit=args.questions)
+            if hasattr(resp, "body_iterator"):
+                size = asyncio.run(_drain(resp.body_iterator))
+            else:
+                size = len(resp.body)
+            elapsed = time.perf_counter() - t0
+            return {"rows": args.questions, "bytes": size, "seconds": elapsed,
+                    "rows_per_sec": args.questions / elapsed}
+        return run
+
+    _section(results, "export_csv", bench_export("csv"))
+    _section(results, "export_json", bench_export("json"))
+
+    # ---- bulk import --------------------------------------------------------------------
+    def bench_import():
+        import io
+        import random
+        from app.services import import_service
+
+        rng = random.Random(args.seed + 1)
+        lines = []
+        for i in range(args.questions):
+            opts = rng.sample(stubs.VOCAB, 4)
+            lines.append(json.dumps({
+                "id": str(uuid.uuid4()), "stem": f"Imported question {i} about {opts[0]}?",
+                "options": opts, "answer": opts[0],
+                "explanation": f"Because {opts[0]} is described in the imported context.",
+                "difficulty": rng.choice(["easy", "medium", "hard"]), "topic": rng.choice(stubs.VOCAB),
+            }))
+        lines.append('{"stem": "too short"}')  # one reject
+        data = ("\n".join(lines) + "\n").encode()
+        first = import_service.import_questions(io.BytesIO(data), "ndjson")
+        again = import_service.import_questions(io.BytesIO(data), "ndjson")  # all ids present
+        keys = ("read", "inserted", "duplicates", "rejected", "seconds", "rows_per_sec")
+        return {"fresh": {k: first[k] for k in keys}, "reimport": {k: again[k] for k in keys}}
+
+    _section(results, "import_ndjson", bench_import)
+
+    # ---- list endpoints (full HTTP stack, in-process) ----------------------------------
+    def bench_list():
+        from fastapi.testclient import TestClient
+        from app.main import app
+
+        out = {}
+        with TestClient(app) as client:
+            with get_session() as s:
+                qid = str(s.query(Question.id).limit(1).scalar())
+            endpoints = {
+                "latest_10": "/questions/latest?limit=10",
+                "latest_100": "/questions/latest?limit=100",
+                "by_doc_20": f"/questions/by_doc/{doc_ids[0]}?limit=20" if doc_ids else None,
+                "get_one": f"/questions/{qid}",
+                "search_10": f"/questions/search?q={stubs.VOCAB[0]}&limit=10",
+                "count": "/questions/count",
+                "stats": "/questions/stats",
+            }
+            for name, path in endpoints.items():
+                if not path:
+                    continue
+                resp = client.get(path)
+                out[name] = {"status": resp.status_code, **_timeit(lambda: client.get(path), args.list_iters)}
+                # polling client that already has the current page → 304
+                etag = resp.headers.get("etag")
+                if etag:
+                    hdrs = {"If-None-Match": etag}
+                    status = client.get(path, headers=hdrs).status_code
+                    out[f"{name}_not_modified"] = {
+                        "status": status, **_timeit(lambda: client.get(path, headers=hdrs), args.list_iters)
+                    }
+        return out
+
+    _section(results, "list_endpoints", bench_list)
+
+    report = {
+        "meta": {
+            "git_rev": _git_rev(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+            "database": os.environ["DATABASE_URL"].split("@")[-1],
+        },
+        "results": results,
+    }
+    Path(args.out).write_text(json.dumps(report, indent=2, default=str))
+    print(f"[BENCH] wrote {args.out}")
+    return report
+
+
+if __name__ == "__main__":
+    failed = _failed(main())
+    if failed:
+        print(f"[BENCH] failed sections: {', '.join(failed)}")
+        sys.exit(1)
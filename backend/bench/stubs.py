@@ -0,0 +1,101 @@
+# bench/stubs.py
+"""Deterministic local stand-ins for the benchmark suite (no downloads, no network)."""
+import hashlib
+import json
+import random
+import re
+import time
+from typing import List
+
+import numpy as np
+
+from app.services.vector_store import EMBED_DIM
+
+_WORD = re.compile(r"[a-z]+")
+_SCHEMA = re.compile(r"Schema:\s*\{(.*?)\}", re.S)
+_KEY = re.compile(r'"(\w+)"\s*:')
+
+VOCAB = [
+    "cell", "membrane", "nucleus", "mitochondrion", "ribosome", "chloroplast", "protein",
+    "enzyme", "osmosis", "diffusion", "protozoa", "amoeba", "paramecium", "photosynthesis",
+    "respiration", "glucose", "ATP", "chromosome", "gene", "DNA", "RNA", "vacuole",
+    "cytoplasm", "tissue", "organ", "xylem", "phloem", "stomata", "transpiration", "pollen",
+    "fertilisation", "embryo", "hormone", "insulin", "neuron", "synapse", "antibody",
+    "pathogen", "bacteria", "virus", "fungi", "algae", "ecosystem", "producer", "consumer",
+]
+
+
+class HashEmbedder:
+    """Feature-hashing bag-of-words embedder; same text → same unit vector."""
+
+    def __init__(self, dim: int = EMBED_DIM):
+        self.dim = dim
+
+    def __call__(self, texts: List[str]) -> List[List[float]]:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for w in _WORD.findall(text.lower()):
+                h = int.from_bytes(hashlib.blake2b(w.encode(), digest_size=8).digest(), "little")
+                out[row, h % self.dim] += 1.0 if (h >> 63) else -1.0
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (out / norms).tolist()
+
+
+class StubGenerator:
+    """
+    Pipeline-shaped generator that follows the prompt contract: a JSON object with
+    exactly the keys the prompt's Schema asks for, written from its Context.
+    Like the real model, greedy decoding (do_sample=False) is a function of the
+    prompt alone; sampling also depends on `seed`. `ms_per_token` optionally
+    simulates decode cost.
+    """
+
+    def __init__(self, ms_per_token: float = 0.0, tokens_per_item: int = 120):
+        self.ms_per_token = ms_per_token
+        self.tokens_per_item = tokens_per_item
+
+    def __call__(self, prompt: str, *, do_sample: bool = False, seed=None,
+                 return_full_text: bool = True, **kwargs):
+        key = f"{seed}:{prompt}" if do_sample else prompt
+        rng = random.Random(int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little"))
+        head, _, context = prompt.partition("Context:")
+        schema = _SCHEMA.search(head)
+        fields = _KEY.findall(schema.group(1)) if schema else ["stem", "options", "answer"]
+        words = [w for w in _WORD.findall(context.lower()) if len(w) > 3] or VOCAB
+        focus, other = rng.sample(words, 2) if len(set(words)) > 1 else (words[0], words[0])
+        options = rng.sample(VOCAB, 4)
+        full = {
+            "stem": f"In the passage, which term is most closely associated with {focus} and {other}?",
+            "options": options,
+            "answer": options[rng.randrange(4)],
+            "explanation": f"The context describes {focus} together with {options[0]} and {options[1]}, "
+                           f"which supports the keyed answer.",
+            "difficulty": rng.choice(["easy", "medium", "hard"]),
+            "topic": focus,
+        }
+        if self.ms_per_token:
+            time.sleep(self.ms_per_token * self.tokens_per_item / 1000.0)
+        text = json.dumps({f: full[f] for f in fields if f in full})
+        if return_full_text:  # HF pipeline default: prompt + completion
+            text = prompt + text
+        return [{"generated_text": text}]
+
+
+def make_pdf(pages: int, sentences_per_page: int = 40, seed: int = 0) -> bytes:
+    """Synthetic biology-flavoured PDF with `pages` pages of short sentences."""
+    import fitz  # PyMuPDF
+
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page()
+        lines = []
+        for _ in range(sentences_per_page):
+            words = rng.sample(VOCAB, 6)
+            lines.append(f"The {words[0]} interacts with the {words[1]} during {words[2]} "
+                         f"while {words[3]} and {words[4]} regulate {words[5]}.")
+        page.insert_textbox(fitz.Rect(36, 36, 576, 806), "\n".join(lines), fontsize=7)
+    data = doc.tobytes()
+    doc.close()
+    return data
@@ -0,0 +1,83 @@
+# tests/conftest.py
+"""
+Offline test setup: SQLite (or TEST_DATABASE_URL), in-process Qdrant and a deterministic stand-in LLM.
+Settings are read at import time, so the environment is set before any `app.*` import.
+"""
+import hashlib
+import json
+import os
+import random
+import re
+import tempfile
+import uuid
+
+import pytest
+
+_TMP = tempfile.mkdtemp(prefix="biomentor-tests-")
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL") or f"sqlite:///{os.path.join(_TMP, 'test.db')}"
+os.environ["QDRANT_LOCATION"] = ":memory:"
+os.environ.pop("INFERENCE_URLS", None)
+
+from qdrant_client.models import PointStruct  # noqa: E402
+
+from app.services import inference  # noqa: E402
+from app.services.db import init_db  # noqa: E402
+from app.services.vector_store import COLLECTION, EMBED_DIM, get_qdrant  # noqa: E402
+
+_LINE = re.compile(r"^\(p(\d+)#(\d+)\): (.*)$", re.M)
+
+
+def embed(texts):
+    """Same text → same unit vector."""
+    out = []
+    for t in texts:
+        rng = random.Random(hashlib.sha256(t.encode()).digest())
+        v = [rng.uniform(-1, 1) for _ in range(EMBED_DIM)]
+        norm = sum(x * x for x in v) ** 0.5
+        out.append([x / norm for x in v])
+    return out
+
+
+def generate(prompt, *, do_sample=False, seed=None, return_full_text=True, **kwargs):
+    """
+    Pipeline-shaped model that honours the prompt contract: one MCQ about a
+    sentence of the context. Greedy → always the first line; sampling → the line
+    picked by the seed, so the output depends only on (prompt, seed).
+    """
+    lines = _LINE.findall(prompt)
+    pick = random.Random(seed).randrange(len(lines)) if do_sample and lines else 0
+    page, idx, text = lines[pick] if lines else ("0", "0", "no context")
+    item = {
+        "stem": f"According to page {page} chunk {idx}, which statement holds: {text}?",
+        "options": ["only this one", "the opposite", "neither", "both"],
+        "answer": "only this one",
+        "explanation": f"The context states on page {page} that {text}; the other options contradict it.",
+        "difficulty": "medium",
+        "topic": "cell biology",
+    }
+    out = json.dumps(item)
+    return [{"generated_text": prompt + out if return_full_text else out}]
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _models():
+    inference.install(generator=generate, embedder=embed)
+    init_db()
+
+
+@pytest.fixture
+def doc_id():
+    """A freshly 'ingested' doc: 6 pages × 4 chunks, straight into Qdrant."""
+    from app.services.ingestion_service import _ensure_collection
+
+    _ensure_collection()
+    doc = str(uuid.uuid4())
+    chunks = [
+        {"doc_id": doc, "page": p, "idx": i, "text": f"cell fact {p}.{i} about membranes and organelles"}
+        for p in range(1, 7) for i in range(4)
+    ]
+    vectors = embed([c["text"] for c in chunks])
+    get_qdrant().upsert(COLLECTION, points=[
+        PointStruct(id=str(uuid.uuid4()), vector=v, payload=c) for c, v in zip(chunks, vectors)
+    ])
+    return doc
@@ -0,0 +1,38 @@
+# tests/test_ingestion_service.py
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import fitz
+import pytest
+
+from app.config import settings
+from app.services import ingestion_service
+
+
+def test_failed_shard_waits_for_the_others_before_unlinking(monkeypatch):
+    seen = []
+
+    def extract_shard(path, start, end):
+        if start == 0:
+            raise ValueError("corrupt page")
+        time.sleep(0.2)
+        seen.append(os.path.exists(path))
+        return []
+
+    pool = ThreadPoolExecutor(max_workers=4)
+    monkeypatch.setattr(ingestion_service, "extract_shard", extract_shard)
+    monkeypatch.setattr(ingestion_service, "_extract_pool", lambda: pool)
+    monkeypatch.setattr(settings, "INGEST_WORKERS", 4)
+    monkeypatch.setattr(settings, "INGEST_PAGES_PER_SHARD", 1)
+    pdf = fitz.open()
+    for _ in range(4):
+        pdf.new_page()
+
+    with pytest.raises(ValueError):
+        asyncio.run(ingestion_service._extract_and_embed(pdf.tobytes()))
+
+    # every shard that started ran against the file; none was still running afterwards
+    pool.shutdown(wait=True)
+    assert seen and all(seen)
@@ -0,0 +1,64 @@
+# tests/test_job_service.py
+import asyncio
+
+import pytest
+from sqlalchemy import select
+
+from app.models.generation_job import GenerationJob
+from app.models.question import Question
+from app.services import job_service
+from app.services.db import get_session
+
+
+async def _run_to_end(job_id: str) -> dict:
+    while job_service._tasks:
+        await asyncio.gather(*list(job_service._tasks))
+    return job_service.get_job(job_id)
+
+
+@pytest.mark.parametrize("query", [None, "membranes"])
+def test_job_reaches_target(doc_id, query):
+    async def main():
+        job = await job_service.create_job(doc_id, 6, query=query, k=4)
+        return await _run_to_end(job["id"])
+
+    job = asyncio.run(main())
+
+    assert job["status"] == "done"
+    assert job["n_done"] == 6
+    with get_session() as s:
+        stems = s.execute(select(Question.stem).where(Question.source_doc_id == doc_id)).scalars().all()
+    assert len(stems) == len(set(stems)) == 6
+
+
+def test_no_write_after_cancel(doc_id):
+    with get_session() as s:
+        row = GenerationJob(doc_id=doc_id, k=4, n_target=3, n_done=0, n_failed=0,
+                            status="queued", active_seconds=0.0)
+        s.add(row)
+        s.commit()
+        job_id = str(row.id)
+    assert job_service._claim(job_id)
+    job_service.cancel_job(job_id)
+
+    item = {"stem": "Which organelle makes ATP in the cell?", "options": ["a", "b", "c", "d"],
+            "answer": "a", "explanation": "x" * 40, "difficulty": "easy", "topic": "cells"}
+    assert job_service._checkpoint(job_id, item, 0.1) == "cancelled"
+
+    assert job_service.get_job(job_id)["n_done"] == 0
+    with get_session() as s:
+        assert not s.execute(select(Question.id).where(Question.source_doc_id == doc_id)).first()
+
+
+def test_topic_group_reaches_total(doc_id):
+    async def main():
+        specs = job_service.plan_corpus(None, "membranes", total=4, max_docs=5)
+        group = await job_service.create_group(specs, k=4)
+        while job_service._tasks:
+            await asyncio.gather(*list(job_service._tasks))
+        return job_service.get_group(group["group_id"])
+
+    group = asyncio.run(main())
+
+    assert group["status"] == "done"
+    assert group["n_done"] == group["n_target"] == 4
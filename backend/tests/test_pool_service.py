@@ -0,0 +1,95 @@
+# tests/test_pool_service.py
+import asyncio
+import json
+
+import fitz
+import pytest
+from fastapi import HTTPException
+
+from app.api import routes_qgen
+from app.config import settings
+from app.services import inference, pool_service, qgen_service
+from app.services.ingestion_service import ingest_pdf
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(settings, "POOL_ENABLED", True)
+    monkeypatch.setattr(pool_service, "schedule_refill", lambda *a, **kw: False)
+
+
+def _fill(doc_id: str, n: int) -> None:
+    items = asyncio.run(qgen_service.generate_batch_from_doc(doc_id, n, k=4, seed=1000))
+    assert pool_service.deposit(doc_id, None, items) == n
+
+
+def test_batch_serves_pool_then_generates_shortfall(pool, doc_id):
+    _fill(doc_id, 2)
+    req = routes_qgen.BatchReq(docId=doc_id, n=5, k=4)
+
+    out = asyncio.run(routes_qgen.from_doc_batch_and_save(req))
+
+    assert out["from_pool"] == 2
+    stems = [q["stem"] for q in out["saved"]]
+    assert len(stems) == len(set(stems)) == 5
+    assert pool_service.pool_size(doc_id) == 0
+
+
+def test_failed_request_leaves_pool_untouched(pool, doc_id, monkeypatch):
+    _fill(doc_id, 2)
+
+    async def broken(*a, **kw):
+        raise HTTPException(status_code=422, detail="model down")
+
+    monkeypatch.setattr(qgen_service, "generate_batch_from_doc", broken)
+    with pytest.raises(HTTPException):
+        asyncio.run(routes_qgen.from_doc_batch_and_save(routes_qgen.BatchReq(docId=doc_id, n=5, k=4)))
+
+    assert pool_service.pool_size(doc_id) == 2
+
+
+def test_difficulty_request_keeps_generating_until_n_at_level(pool, doc_id, monkeypatch):
+    model, calls = inference._pipe, []
+
+    def alternating(prompt, **kw):
+        item = json.loads(model(prompt, **kw)[0]["generated_text"])
+        item["difficulty"] = "hard" if len(calls) % 2 else "medium"
+        calls.append(item["difficulty"])
+        return [{"generated_text": json.dumps(item)}]
+
+    monkeypatch.setattr(inference, "_pipe", alternating)
+    req = routes_qgen.BatchReq(docId=doc_id, n=3, k=4, difficulty="hard")
+
+    out = asyncio.run(routes_qgen.from_doc_batch_and_save(req))
+
+    assert [q["difficulty"] for q in out["saved"]] == ["hard"] * 3
+    assert out["pooled"] == pool_service.pool_size(doc_id) > 0
+
+
+def test_difficulty_request_never_404s_after_generating(pool, doc_id):
+    # the stand-in model only writes "medium" items
+    req = routes_qgen.BatchReq(docId=doc_id, n=3, k=4, difficulty="hard")
+
+    out = asyncio.run(routes_qgen.from_doc_batch_and_save(req))
+
+    assert out["saved"] == []
+    assert out["pooled"] == pool_service.pool_size(doc_id) > 0
+
+
+class _Upload:
+    def __init__(self, data: bytes):
+        self.data = data
+
+    async def read(self) -> bytes:
+        return self.data
+
+
+def test_reingest_drops_the_docs_pool(doc_id):
+    _fill(doc_id, 2)
+    pdf = fitz.open()
+    pdf.new_page().insert_text((72, 72), "Mitochondria produce ATP by oxidative phosphorylation.")
+
+    out = asyncio.run(ingest_pdf(_Upload(pdf.tobytes()), doc_id=doc_id))
+
+    assert out["docId"] == doc_id
+    assert pool_service.pool_size(doc_id) == 0
@@ -0,0 +1,58 @@
+# tests/test_qgen_service.py
+import asyncio
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from app.api import routes_qgen
+from app.services import inference, metrics, qgen_service
+from app.services.vector_cache import DocVectorCache
+from app.services.vector_store import COLLECTION, get_qdrant
+
+
+def test_identical_query_requests_share_one_generation(doc_id, monkeypatch):
+    model, calls = inference._pipe, []
+
+    def counting(prompt, **kw):
+        calls.append(prompt)
+        return model(prompt, **kw)
+
+    monkeypatch.setattr(inference, "_pipe", counting)
+    req = routes_qgen.FromDocQueryReq(docId=doc_id, query="membranes", k=4)
+
+    async def main():
+        return await asyncio.gather(*(routes_qgen.from_doc_query(req) for _ in range(4)))
+
+    items = asyncio.run(main())
+
+    assert len(calls) == 1
+    assert len({i["stem"] for i in items}) == 1
+    assert items[0]["topic"] == "membranes"
+
+
+def test_vector_cache_reloads_after_ttl(doc_id):
+    fresh = DocVectorCache(get_qdrant(), COLLECTION, max_bytes=1 << 20, max_docs=4, ttl_s=300)
+    stale = DocVectorCache(get_qdrant(), COLLECTION, max_bytes=1 << 20, max_docs=4, ttl_s=0)
+    for cache in (fresh, stale):
+        first = cache._get(doc_id)
+        assert (cache._get(doc_id) is first) == (cache is fresh)
+
+
+@pytest.mark.parametrize("query", [None, "membranes"])
+def test_rejections_counted_on_both_paths(doc_id, query, monkeypatch):
+    model = inference._pipe
+
+    def terse(prompt, **kw):
+        item = json.loads(model(prompt, **kw)[0]["generated_text"])
+        item["explanation"] = "Because."
+        return [{"generated_text": json.dumps(item)}]
+
+    monkeypatch.setattr(inference, "_pipe", terse)
+    rejected = metrics.QUALITY_REJECTIONS.labels(reason="explanation too short (<40 chars)")
+    before = rejected._value.get()
+
+    with pytest.raises(HTTPException):  # 422: nothing passed the gate
+        asyncio.run(qgen_service.generate_batch_from_doc(doc_id, 1, query=query, k=4, seed=7))
+
+    assert rejected._value.get() - before == 3  # max_attempts_per_item
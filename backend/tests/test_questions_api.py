@@ -0,0 +1,62 @@
+# tests/test_questions_api.py
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models.question import Question
+from app.services.db import get_session
+
+# no `with`: the lifespan would warm up the real models
+client = TestClient(app)
+
+
+def _save(topic: str, difficulty: str = "medium", doc_id: str = "doc-a") -> str:
+    qid = uuid.uuid4()
+    with get_session() as s:
+        s.add(Question(id=qid, stem=f"Which organelle is discussed under {topic}?",
+                       options=["a", "b", "c", "d"], answer="a", explanation="because",
+                       difficulty=difficulty, topic=topic, source_doc_id=doc_id))
+        s.commit()
+    return str(qid)
+
+
+def test_latest_keeps_envelope_and_defaults():
+    for _ in range(6):
+        _save("envelope")
+
+    body = client.get("/questions/latest").json()
+
+    assert len(body["items"]) == 5
+    assert set(body["items"][0]) == {"id", "stem", "answer", "created_at"}
+
+
+@pytest.mark.parametrize("path", [
+    "/questions/latest?topic={topic}&difficulty=hard",
+    "/questions/by_doc/doc-a?topic={topic}&limit=3",
+])
+def test_list_not_modified_until_a_write(path):
+    topic = f"poll-{uuid.uuid4().hex[:8]}"
+    path = path.format(topic=topic)
+    _save(topic, "hard")
+    etag = client.get(path).headers["etag"]
+
+    again = client.get(path, headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.content == b""
+
+    _save(topic, "hard")
+    changed = client.get(path, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+
+def test_get_one_not_modified_only_for_existing_or_issued_tag():
+    qid = _save("single")
+    etag = client.get(f"/questions/{qid}").headers["etag"]
+
+    assert client.get(f"/questions/{qid}", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get(f"/questions/{qid}", headers={"If-None-Match": "*"}).status_code == 304
+    missing = f"/questions/{uuid.uuid4()}"
+    assert client.get(missing, headers={"If-None-Match": "*"}).status_code == 404
+    assert client.get(missing, headers={"If-None-Match": '"stale"'}).status_code == 404